@@ -101,9 +101,9 @@ class VietnamnetCrawler:
         return link_and_thumbnails
 
     @staticmethod
-    def crawl_article_content(link: str, min_content_length=4):
+    def crawl_article_content(link: str, min_content_length=4, timeout: float | None = None):
         try:
-            response = requests.get(link)
+            response = requests.get(link, timeout=timeout)
             soup = BeautifulSoup(response.content, 'html.parser')
 
             content_list = []
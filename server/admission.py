@@ -0,0 +1,123 @@
+import asyncio
+import os
+from server import metrics
+
+
+class Bulkhead:
+    """
+    Concurrency limit of one class of endpoints.
+
+    At most `max_concurrency` requests run at once and at most `max_queue` wait for a slot,
+    requests arriving with a full queue, or waiting longer than `queue_timeout` seconds, are shed.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout=5.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_env(cls, name: str, max_concurrency: int, max_queue: int, queue_timeout=5.0):
+        """
+        Limits can be overridden with GANESHA_<NAME>_CONCURRENCY, GANESHA_<NAME>_QUEUE
+        and GANESHA_<NAME>_QUEUE_TIMEOUT.
+        """
+
+        prefix = f'GANESHA_{name.upper()}_'
+        return cls(
+            name,
+            int(os.environ.get(prefix + 'CONCURRENCY', max_concurrency)),
+            int(os.environ.get(prefix + 'QUEUE', max_queue)),
+            float(os.environ.get(prefix + 'QUEUE_TIMEOUT', queue_timeout)),
+        )
+
+    async def acquire(self) -> bool:
+        """
+        Returns
+        ----------
+        bool
+            False if the request has to be shed.
+        """
+
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            return False
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware running each request inside the bulkhead of its path,
+    so a burst on one endpoint class cannot take the capacity of the others.
+
+    Parameters
+    ----------
+    routes : list
+        (path prefix, bulkhead) pairs, the first matching prefix wins. Other paths are not limited.
+    retry_after : int
+        Seconds sent in the Retry-After header of shed requests.
+    """
+
+    def __init__(self, app, routes: list[tuple[str, Bulkhead]], retry_after=1):
+        self.app = app
+        self.routes = routes
+        self.retry_after = retry_after
+
+    def classify(self, path: str) -> Bulkhead | None:
+        for prefix, bulkhead in self.routes:
+            if path.startswith(prefix):
+                return bulkhead
+        return None
+
+    async def __call__(self, scope, receive, send):
+        bulkhead = self.classify(scope["path"]) if scope["type"] == "http" else None
+        if bulkhead is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await bulkhead.acquire():
+            metrics.requests_shed.inc(bulkhead.name)
+            await self.shed(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
+
+    async def shed(self, send):
+        body = b'{"detail":"Server is busy, try again later"}'
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
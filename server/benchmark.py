@@ -0,0 +1,452 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import re
+import subprocess
+import sys
+from time import perf_counter
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+import numpy as np
+import orjson
+from server.search import InvertedIndex
+from server.suggest import Suggester
+from server.model import Article, ArticleRecommendation, SearchResponse, ShortArticle
+from server import serialize
+from server import similar
+
+
+def measure(func: callable, repeat=20):
+    """
+    Returns
+    ----------
+    tuple
+        (median, p95) run time in milliseconds.
+    """
+
+    times = []
+    for _ in range(repeat):
+        start_time = perf_counter()
+        func()
+        times.append((perf_counter() - start_time) * 1000)
+    return float(np.median(times)), float(np.percentile(times, 95))
+
+
+def synthetic_corpus(num_documents: int, vocabulary_size=20000, title_length=12, description_length=30, seed=0):
+    """
+    Zipf distributed token corpus, roughly shaped like processed vietnamese titles and descriptions.
+
+    Returns
+    ----------
+    list
+        List of (_id, published_date, title tokens, description tokens).
+    """
+
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f'tu_{i}' for i in range(vocabulary_size)])
+    start_date = datetime(2024, 1, 1)
+
+    def sample(length):
+        token_ids = np.minimum(rng.zipf(1.3, length), vocabulary_size) - 1
+        return vocabulary[token_ids].tolist()
+
+    return [
+        (
+            ObjectId(),
+            start_date + timedelta(seconds=int(rng.integers(0, 365 * 24 * 3600))),
+            sample(title_length),
+            sample(description_length),
+        )
+        for _ in range(num_documents)
+    ]
+
+
+def benchmark_search(num_documents=100000, keywords=('tu_3', 'tu_40 tu_7', 'tu_500', 'tu_2 tu_9 tu_15'), limit=30):
+    """
+    Compare the old regex scan (title and description matched per document, then sorted by date),
+    the inverted index sorted by date and the BM25 ranking on the same synthetic corpus.
+    """
+
+    print(f'Building synthetic corpus of {num_documents} documents')
+    corpus = synthetic_corpus(num_documents)
+    documents = [
+        {"title": ' '.join(title), "description": ' '.join(description), "published_date": published_date}
+        for _, published_date, title, description in corpus
+    ]
+
+    index = InvertedIndex()
+    start_time = perf_counter()
+    index.add(corpus)
+    print(f'Index build: {perf_counter() - start_time:.3f}s')
+
+    for keyword in keywords:
+        tokens = keyword.split()
+
+        def regex_search():
+            patterns = [re.compile(fr'(?:^|\s){token}(?:\s|$)', re.IGNORECASE) for token in tokens]
+            matches = [
+                doc for doc in documents
+                if all(pattern.search(doc['title']) or pattern.search(doc['description']) for pattern in patterns)
+            ]
+            matches.sort(key=lambda doc: doc['published_date'], reverse=True)
+            return matches[:limit]
+
+        def date_search():
+            return index.get_ids(index.search(tokens)[:limit])
+
+        def relevance_search():
+            return index.get_ids(index.rank(tokens, index.search(tokens), limit))
+
+        matches = len(index.search(tokens))
+        print(f'\nKeyword: "{keyword}" ({matches} matches)')
+        for name, func, repeat in [
+            ('regex scan', regex_search, 3),
+            ('index, by date', date_search, 50),
+            ('index, bm25', relevance_search, 50),
+        ]:
+            median, p95 = measure(func, repeat)
+            print(f'{name:>16}: median {median:8.3f} ms, p95 {p95:8.3f} ms')
+
+
+def benchmark_suggest(num_documents=100000, prefixes=('t', 'tu', 'tu 1', 'tu 12', 'tu 123'), limit=10):
+    """
+    Time suggestion lookups and incremental additions over the titles of the synthetic corpus.
+    """
+
+    titles = [' '.join(title) for _, _, title, _ in synthetic_corpus(num_documents)]
+    suggester = Suggester()
+    start_time = perf_counter()
+    suggester.add_titles(titles)
+    print(f'Build from {num_documents} titles: {perf_counter() - start_time:.3f}s, {len(suggester.counts)} terms')
+
+    start_time = perf_counter()
+    suggester.add_titles(titles[:1000])
+    print(f'Add 1000 titles: {perf_counter() - start_time:.3f}s')
+
+    for prefix in prefixes:
+        median, p95 = measure(lambda: suggester.suggest(prefix, limit), 200)
+        print(f'{prefix!r:>10}: median {median:8.3f} ms, p95 {p95:8.3f} ms')
+
+
+def synthetic_article(content_length=60):
+    return {
+        "_id": ObjectId(),
+        "index": 0,
+        "link": "https://vnexpress.net/bai-viet-1.html",
+        "web": "vnexpress",
+        "thumbnail": "https://i1-vnexpress.vnecdn.net/2024/12/01/anh-dai-dien.jpg",
+        "category": "thoi-su",
+        "published_date": datetime(2024, 12, 1, 8, 30),
+        "title": "Tiêu đề bài viết về thời sự trong nước " * 2,
+        "description": "Mô tả ngắn gọn nội dung chính của bài viết, thường dài khoảng hai câu. " * 2,
+        "content": [
+            "Đoạn văn nội dung của bài viết, mỗi đoạn có vài câu. " * 5 if i % 5 else
+            ["IMAGECONTENT https://i1-vnexpress.vnecdn.net/2024/12/01/anh.jpg", "Chú thích ảnh"]
+            for i in range(content_length)
+        ],
+    }
+
+
+def benchmark_serialization(repeat=200):
+    """
+    Compare building pydantic models then letting FastAPI validate and encode them against `response_model`
+    (the old path) with encoding the Mongo documents straight to JSON bytes, per endpoint.
+    """
+
+    feed = [synthetic_article() for _ in range(40)]
+    article = synthetic_article(content_length=120)
+    recommendations = feed[:10]
+
+    loop = asyncio.new_event_loop()
+    fields = {}
+
+    def fastapi_encode(response_model, content):
+        # FastAPI creates the response field once per route
+        if response_model not in fields:
+            fields[response_model] = create_model_field(name='Response', type_=response_model, mode='serialization')
+        field = fields[response_model]
+        content = loop.run_until_complete(serialize_response(field=field, response_content=content, is_coroutine=True))
+        return JSONResponse(content).body
+
+    endpoints = {
+        "/articles": (
+            lambda: fastapi_encode(list[ShortArticle], [ShortArticle(**doc) for doc in feed]),
+            lambda: serialize.dumps([serialize.short_article(doc) for doc in feed]),
+        ),
+        "/article/{id}": (
+            lambda: fastapi_encode(ArticleRecommendation, ArticleRecommendation(
+                article=Article(**article),
+                recommendations=[ShortArticle(**doc) for doc in recommendations],
+            )),
+            lambda: serialize.dumps({
+                "article": serialize.article(article),
+                "recommendations": [serialize.short_article(doc) for doc in recommendations],
+            }),
+        ),
+        "/search": (
+            lambda: fastapi_encode(SearchResponse, SearchResponse(
+                articles=[ShortArticle(**doc) for doc in feed[:30]], total=1500
+            )),
+            lambda: serialize.dumps({"articles": [serialize.short_article(doc) for doc in feed[:30]], "total": 1500}),
+        ),
+    }
+
+    for endpoint, (pydantic_path, fast_path) in endpoints.items():
+        assert orjson.loads(pydantic_path()) == orjson.loads(fast_path()), f'{endpoint} output differs'
+        pydantic_median, _ = measure(pydantic_path, repeat)
+        fast_median, _ = measure(fast_path, repeat)
+        print(
+            f'{endpoint:>14}: pydantic {pydantic_median:7.3f} ms, '
+            f'orjson {fast_median:7.3f} ms ({pydantic_median / fast_median:.1f}x)'
+        )
+    loop.close()
+
+
+# modules the API server must not import at startup
+HEAVY_MODULES = ('underthesea', 'sklearn', 'gensim', 'numba', 'pynndescent', 'bs4', 'crawler', 'server.updater')
+
+
+def benchmark_startup(repeat=5, max_seconds=2.0):
+    """
+    Time `import server.main` in fresh interpreters (run from the directory holding `data/`).
+
+    Exits with status 1 if the median import time goes over `max_seconds`
+    or a heavy module is imported, so it can guard against regressions in CI.
+    """
+
+    script = (
+        'import sys, time\n'
+        'start_time = time.perf_counter()\n'
+        'import server.main\n'
+        'print(time.perf_counter() - start_time)\n'
+        f'print(",".join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n'
+    )
+
+    times = []
+    heavy_modules = ''
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        elapsed, heavy_modules = (result.stdout.splitlines() + [''])[:2]
+        times.append(float(elapsed))
+
+    median = float(np.median(times))
+    print(f'import server.main: median {median:.3f}s, max {max(times):.3f}s over {repeat} runs')
+
+    failed = False
+    if heavy_modules:
+        print(f'Heavy modules imported at startup: {heavy_modules}')
+        failed = True
+    if median > max_seconds:
+        print(f'Startup is slower than the {max_seconds}s budget')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+def synthetic_topic_distributions(num_documents: int, num_topics=50, alpha=0.1, seed=0) -> np.ndarray:
+    """
+    Sparse looking topic distributions like the LDA model predicts.
+    """
+
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.full(num_topics, alpha), num_documents).astype(np.float32)
+
+
+def exact_neighbors(topic_distributions: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Brute force k nearest neighbours of the `queries` rows under `combined_distance`.
+    """
+
+    from server.updater import combined_distance
+
+    neighbors = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        distances = np.array([combined_distance(topic_distributions[query], row) for row in topic_distributions])
+        neighbors[i] = np.argsort(distances, kind='stable')[:k]
+    return neighbors
+
+
+def recall(graph: np.ndarray, queries: np.ndarray, true_neighbors: np.ndarray) -> float:
+    k = true_neighbors.shape[1]
+    found = [len(set(graph[query, :k].tolist()) & set(row.tolist())) for query, row in zip(queries, true_neighbors)]
+    return sum(found) / true_neighbors.size
+
+
+def benchmark_nndescent_update(num_documents=20000, num_new=500, num_topics=50, num_queries=100, k=10):
+    """
+    Compare rebuilding the nndescent index with adding the new articles to the saved one,
+    on wall time and recall of the old and new articles' neighbours.
+    """
+
+    from pynndescent import NNDescent
+    from server.updater import combined_distance
+
+    topic_distributions = synthetic_topic_distributions(num_documents + num_new, num_topics)
+    old_topic_distributions, new_topic_distributions = topic_distributions[:num_documents], topic_distributions[num_documents:]
+
+    # compile the numba code before timing anything
+    NNDescent(topic_distributions[:2000], metric=combined_distance).update(xs_fresh=new_topic_distributions[:10])
+
+    rng = np.random.default_rng(1)
+    old_queries = rng.choice(num_documents, num_queries // 2, replace=False)
+    new_queries = num_documents + rng.choice(num_new, num_queries // 2, replace=False)
+    queries = np.concatenate([old_queries, new_queries])
+    print(f'Exact neighbours of {len(queries)} articles')
+    true_neighbors = exact_neighbors(topic_distributions, queries, k)
+
+    start_time = perf_counter()
+    nndescent = NNDescent(old_topic_distributions, metric=combined_distance)
+    print(f'\nInitial build of {num_documents} articles: {perf_counter() - start_time:.1f}s')
+
+    start_time = perf_counter()
+    rebuilt = NNDescent(topic_distributions, metric=combined_distance)
+    rebuild_time = perf_counter() - start_time
+
+    start_time = perf_counter()
+    nndescent.update(xs_fresh=new_topic_distributions)
+    update_time = perf_counter() - start_time
+
+    half = len(old_queries)
+    for name, index, elapsed in [('full rebuild', rebuilt, rebuild_time), ('incremental', nndescent, update_time)]:
+        graph = index.neighbor_graph[0]
+        print(
+            f'{name:>14}: {elapsed:6.1f}s, recall@{k} old {recall(graph, queries[:half], true_neighbors[:half]):.3f}, '
+            f'new {recall(graph, queries[half:], true_neighbors[half:]):.3f}, '
+            f'self first {np.mean(graph[:, 0] == np.arange(len(graph))):.3f}'
+        )
+
+
+def benchmark_distance(num_documents=20000, num_topics=50, num_pairs=2000000, k=10):
+    """
+    Compare `combined_distance` on raw topic distributions with `prepared_combined_distance` on prepared rows,
+    on distance evaluations per second and nndescent build time.
+    """
+
+    import numba
+    from pynndescent import NNDescent
+    from server.updater import combined_distance
+    from server.prepared import prepare_vectors
+    from server.distance import prepared_combined_distance
+
+    @numba.njit
+    def evaluate_pairs(distance, vectors, pairs):
+        total = 0.0
+        for i in range(pairs.shape[0]):
+            total += distance(vectors[pairs[i, 0]], vectors[pairs[i, 1]])
+        return total
+
+    topic_distributions = synthetic_topic_distributions(num_documents, num_topics)
+    start_time = perf_counter()
+    prepared = prepare_vectors(topic_distributions)
+    print(f'Preparing {num_documents} vectors: {perf_counter() - start_time:.3f}s')
+
+    pairs = np.random.default_rng(1).integers(0, num_documents, (num_pairs, 2))
+    kernels = [
+        ('combined_distance', combined_distance, topic_distributions),
+        ('prepared', prepared_combined_distance, prepared),
+    ]
+    for name, distance, vectors in kernels:
+        # compile before timing
+        evaluate_pairs(distance, vectors, pairs[:10])
+        median, _ = measure(lambda: evaluate_pairs(distance, vectors, pairs), 5)
+        print(f'{name:>18}: {num_pairs / (median / 1000):14,.0f} distances/s')
+
+    graphs = []
+    for name, distance, vectors in kernels:
+        NNDescent(vectors[:1000], metric=distance)
+        start_time = perf_counter()
+        graphs.append(NNDescent(vectors, metric=distance).neighbor_graph[0])
+        print(f'{name:>18}: nndescent build {perf_counter() - start_time:.1f}s')
+
+    agreement = np.mean([len(set(a[:k]) & set(b[:k])) / k for a, b in zip(graphs[0].tolist(), graphs[1].tolist())])
+    print(f'Top {k} neighbours in common: {agreement:.3f}')
+
+
+def benchmark_knn(sizes=(100000, 1000000), num_topics=50, sample_pairs=10 ** 8, nndescent_max_size=200000, k=30):
+    """
+    Time the exact neighbor graph against nndescent on synthetic topic distributions.
+
+    The exact graph compares every pair, so its time is measured on a sample of rows
+    (`sample_pairs` distance evaluations) and scaled to all rows, which is exact up to timing noise
+    because every row costs the same. nndescent is built in full up to `nndescent_max_size` articles
+    and its recall is measured against the exact rows of the sample.
+    """
+
+    import numba
+    from pynndescent import NNDescent
+    from server.prepared import prepare_vectors
+    from server.distance import prepared_combined_distance
+    from server.knn import exact_neighbor_graph
+
+    print(f'{numba.get_num_threads()} threads')
+    # compile before timing
+    warm_up = prepare_vectors(synthetic_topic_distributions(2000, num_topics))
+    exact_neighbor_graph(warm_up, k)
+    NNDescent(warm_up, metric=prepared_combined_distance, n_neighbors=k)
+
+    for num_documents in sizes:
+        prepared = prepare_vectors(synthetic_topic_distributions(num_documents, num_topics))
+        sample_rows = max(1, min(num_documents, sample_pairs // num_documents))
+
+        start_time = perf_counter()
+        exact_rows, _ = exact_neighbor_graph(prepared, k, start=0, end=sample_rows)
+        elapsed = perf_counter() - start_time
+        print(
+            f'\n{num_documents} articles, exact: {elapsed:.1f}s for {sample_rows} rows, '
+            f'{elapsed * num_documents / sample_rows:,.0f}s estimated for the whole graph'
+        )
+
+        if num_documents > nndescent_max_size:
+            print(f'{num_documents} articles, nndescent: skipped, over {nndescent_max_size} articles')
+            continue
+        start_time = perf_counter()
+        graph = NNDescent(prepared, metric=prepared_combined_distance, n_neighbors=k).neighbor_graph[0]
+        elapsed = perf_counter() - start_time
+        found = [len(set(graph[i, 1:].tolist()) & set(exact_rows[i, 1:].tolist())) for i in range(sample_rows)]
+        print(f'{num_documents} articles, nndescent: {elapsed:.1f}s, recall@{k - 1} {sum(found) / (sample_rows * (k - 1)):.3f}')
+
+
+def benchmark_similar(texts=('Giá vàng hôm nay tăng mạnh', 'Đội tuyển Việt Nam thắng trận giao hữu'), repeat=50, max_ms=100.0):
+    """
+    Time /similar queries (tokenizing, LDA inference and NNDescent query) in a worker process like the API runs them,
+    using the models saved under `data/` (run from the directory holding it).
+
+    Exits with status 1 if the median latency of a text goes over `max_ms`.
+    """
+
+    start_time = perf_counter()
+    with ProcessPoolExecutor(1, multiprocessing.get_context('spawn'), initializer=similar.load_models) as pool:
+        num_documents = pool.submit(similar.warm_up).result()
+        print(f'Worker start and warm up: {perf_counter() - start_time:.1f}s, {num_documents} indexed articles')
+
+        failed = False
+        for text in texts:
+            for name, func in [
+                ('in worker', lambda: pool.submit(similar.similar_to_text, text, 10).result()),
+                ('tokenizing only', lambda: pool.submit(similar.data.process_paragraph, text).result()),
+            ]:
+                median, p95 = measure(func, repeat)
+                print(f'{text[:30]!r:>34} {name:>16}: median {median:8.3f} ms, p95 {p95:8.3f} ms')
+                if name == 'in worker' and median > max_ms:
+                    failed = True
+
+    if failed:
+        print(f'Similar queries are slower than the {max_ms} ms budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    benchmarks = {
+        "search": benchmark_search,
+        "serialization": benchmark_serialization,
+        "suggest": benchmark_suggest,
+        "startup": benchmark_startup,
+        "similar": benchmark_similar,
+        "nndescent_update": benchmark_nndescent_update,
+        "distance": benchmark_distance,
+        "knn": benchmark_knn,
+    }
+    benchmarks[sys.argv[1]]()
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+import hashlib
+from threading import Lock
+from time import monotonic
+
+
+data_generation = 0
+# `metadata.data_generation` of the loaded data, the same in every API process serving it
+shared_generation = None
+
+
+def bump_generation(shared: int | None = None) -> int:
+    """
+    Mark every cached value computed from the current article corpus as stale.
+
+    Parameters
+    ----------
+    shared : int | None
+        Data generation recorded by the updater worker for the data now served.
+    """
+
+    global data_generation, shared_generation
+    data_generation += 1
+    shared_generation = shared
+    return data_generation
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag of a response computed from the current data generation.
+
+    Every worker and restart serving the same worker generation returns the same ETag,
+    without one (no update ran yet) the reloads of this process tell the data apart.
+    """
+
+    generation = ('shared', shared_generation) if shared_generation is not None else ('local', data_generation)
+    key = repr(generation + parts).encode()
+    return f'"{hashlib.blake2b(key, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+class LRUCache:
+    """
+    Bounded LRU cache with a per entry time to live.
+
+    Keys are prefixed with the data generation, so entries computed before the last
+    `bump_generation` are never returned and get evicted as new entries come in.
+
+    With `max_weight`, entries are also evicted until the summed `weigh(value)` fits,
+    for caches whose values vary a lot in size.
+    """
+
+    def __init__(self, max_size=1024, ttl=300.0, max_weight: int | None = None, weigh: callable = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        key = (data_generation, key)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < monotonic():
+                if item is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        key = (data_generation, key)
+        weight = self.weigh(value) if self.weigh is not None else 1
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (monotonic() + self.ttl, value, weight)
+            self.weight += weight
+            while len(self._items) > self.max_size or (self.max_weight is not None and self.weight > self.max_weight):
+                self._remove(next(iter(self._items)))
+
+    def _remove(self, key):
+        self.weight -= self._items.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.weight = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "weight": self.weight,
+            "max_weight": self.max_weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+        }
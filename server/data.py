@@ -1,13 +1,19 @@
+from __future__ import annotations
+from functools import cache
 from time import time
+from typing import TYPE_CHECKING
 from bson import json_util
 import os
-from underthesea import sent_tokenize, word_tokenize
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 import unicodedata
 import pickle
-from pynndescent import NNDescent
 import numpy as np
 
+# underthesea and pynndescent take seconds to import, they are imported where they are used
+# so the API server does not pay for them at startup
+if TYPE_CHECKING:
+    from pynndescent import NNDescent
+
 
 def caculate_time(func: callable):
     start_time = time()
@@ -22,6 +28,17 @@ def connect_to_mongo(host='localhost', port=27017):
     return MongoClient(connect_str)
 
 
+def connect_to_mongo_async(host='localhost', port=27017, max_pool_size=200, min_pool_size=10):
+    connect_str = f"mongodb://{host}:{port}"
+    return AsyncMongoClient(
+        connect_str,
+        maxPoolSize=max_pool_size,
+        minPoolSize=min_pool_size,
+        maxIdleTimeMS=60 * 1000,
+        waitQueueTimeoutMS=10 * 1000,
+    )
+
+
 def load_nndescent() -> NNDescent:
     with open('data/ann_model/nndescent.pkl', "rb") as f:
         return pickle.load(f)
@@ -33,11 +50,17 @@ def save_nndescent(nndescent: NNDescent):
 
 
 def save_neighbor_graph(graph: np.ndarray):
-  np.save('data/ann_model/neighbor_graph.npy', graph)
+  # write to a temporary file then rename, servers keep reading their mapping of the old file
+  # instead of seeing a truncated one
+  temp_path = 'data/ann_model/neighbor_graph.npy.tmp'
+  with open(temp_path, 'wb') as f:
+    np.save(f, graph)
+  os.replace(temp_path, 'data/ann_model/neighbor_graph.npy')
 
 
 def load_neighbor_graph() -> np.ndarray:
-  return np.load('data/ann_model/neighbor_graph.npy')
+  # memory mapped so every worker shares the same page cache instead of its own copy
+  return np.load('data/ann_model/neighbor_graph.npy', mmap_mode='r')
 
 
 def save_topic_distributions(matrix: np.ndarray):
@@ -48,6 +71,26 @@ def load_topic_distributions() -> np.ndarray:
   return np.load('data/ann_model/topic_distributions.npy')
 
 
+def save_search_index(index):
+    os.makedirs('data/search', exist_ok=True)
+    with open('data/search/inverted_index.pkl', "wb") as f:
+        pickle.dump(index, f)
+
+
+def load_search_index():
+    """
+    Returns
+    ----------
+    InvertedIndex | None
+        None if the index has not been built yet.
+    """
+
+    if not os.path.exists('data/search/inverted_index.pkl'):
+        return None
+    with open('data/search/inverted_index.pkl', "rb") as f:
+        return pickle.load(f)
+
+
 def load_processed_titles() -> list[str]:
     with open('data/preprocess/processed_titles.pkl', "rb") as f:
         return pickle.load(f)
@@ -71,6 +114,7 @@ def load_fixed_words():
 
 
 def create_punctuations_string():
+    # scans every code point, use load_punctuations_string instead
     punctuations = ''.join(
         chr(i) for i in range(0x110000)
         if unicodedata.category(chr(i)).startswith('P') or
@@ -83,13 +127,55 @@ def create_punctuations_string():
     return punctuations
 
 
-stop_words = load_stop_words()
-fixed_words = load_fixed_words()
-translator = str.maketrans('', '', create_punctuations_string())
+def load_punctuations_string():
+    """
+    Precomputed `create_punctuations_string`, created on first use.
+    """
+
+    file_path = 'data/preprocess/punctuations.txt'
+    if os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8', newline='') as file:
+            return file.read()
+
+    punctuations = create_punctuations_string()
+    # workers starting together may all create it, each writes its own temporary file then renames it
+    # so none of them reads a partly written file
+    temp_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8', newline='') as file:
+        file.write(punctuations)
+    os.replace(temp_path, file_path)
+    return punctuations
+
+
+@cache
+def get_stop_words():
+    return load_stop_words()
+
+
+@cache
+def get_fixed_words():
+    return load_fixed_words()
+
+
+@cache
+def get_translator():
+    return str.maketrans('', '', load_punctuations_string())
+
+
+def warm_up_nlp():
+    import underthesea
+
+    get_stop_words()
+    get_fixed_words()
+    get_translator()
 
 
 def process_sentence(sent: str):
-    sent = sent.translate(translator)
+    from underthesea import word_tokenize
+
+    stop_words = get_stop_words()
+    fixed_words = get_fixed_words()
+    sent = sent.translate(get_translator())
     tokens = word_tokenize(sent, fixed_words=fixed_words)
     result = []
     for token in tokens:
@@ -104,6 +190,8 @@ def process_sentence(sent: str):
 
 
 def process_paragraph(text: str):
+    from underthesea import sent_tokenize
+
     res = []
     texts = sent_tokenize(text)
     for text in texts:
@@ -123,6 +211,10 @@ def process_title(title: str):
     return ' '.join(process_sentence(title))
 
 
+def process_search_tokens(title: str, description: str):
+    return process_sentence(title), process_paragraph(description)
+
+
 def get_titles(collection_name: str):
     with connect_to_mongo() as client:
         db = client['Ganesha_News']
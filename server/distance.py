@@ -0,0 +1,62 @@
+import numpy as np
+import numba
+from server.prepared import NUM_SCALARS
+
+
+@numba.njit(fastmath=True, cache=True)
+def prepared_combined_distance(a, b):
+    """
+    Same distance as `server.updater.combined_distance` on prepared rows, in one loop without allocations.
+    """
+
+    dim = (a.shape[0] - NUM_SCALARS) // 3
+    norm_a = float(a[3 * dim])
+    norm_b = float(b[3 * dim])
+    l1_norm_a = float(a[3 * dim + 1])
+    l1_norm_b = float(b[3 * dim + 1])
+
+    dot = 0.0
+    sqrt_dot = 0.0
+    # sum(sqrt(x) ** 2) is the l1 norm, but summed from the same rounded square roots as sqrt_dot
+    # it cancels out exactly for identical vectors instead of leaving a distance of ~1e-4
+    sqrt_norm_a = 0.0
+    sqrt_norm_b = 0.0
+    intersection = 0.0
+    mixture_entropy = 0.0
+    for i in range(dim):
+        dot += a[i] * b[i]
+        sqrt_dot += a[2 * dim + i] * b[2 * dim + i]
+        sqrt_norm_a += a[2 * dim + i] * a[2 * dim + i]
+        sqrt_norm_b += b[2 * dim + i] * b[2 * dim + i]
+        intersection += min(a[i], b[i])
+        m = 0.5 * (a[dim + i] + b[dim + i])
+        mixture_entropy += m * np.log(m)
+
+    # cosine
+    if norm_a == 0.0 and norm_b == 0.0:
+        result_cos = 0.0
+    elif norm_a == 0.0 or norm_b == 0.0:
+        result_cos = 1.0
+    else:
+        result_cos = 1.0 - dot / np.sqrt(norm_a * norm_b)
+
+    # jensen shannon, 0.5 * (KL(a || m) + KL(b || m))
+    result_jen = 0.5 * (a[3 * dim + 2] + b[3 * dim + 2]) - mixture_entropy
+
+    # hellinger
+    if l1_norm_a == 0 and l1_norm_b == 0:
+        result_hel = 0.0
+    elif l1_norm_a == 0 or l1_norm_b == 0:
+        result_hel = 1.0
+    else:
+        result_hel = np.sqrt(max(0.0, 1 - sqrt_dot / np.sqrt(sqrt_norm_a * sqrt_norm_b)))
+
+    # jaccard, min + max = a + b so the union follows from the intersection
+    if l1_norm_a == 0 and l1_norm_b == 0:
+        result_jac = 0.0
+    elif l1_norm_a == 0 or l1_norm_b == 0:
+        result_jac = 1.0
+    else:
+        result_jac = 1 - intersection / (l1_norm_a + l1_norm_b - intersection)
+
+    return (result_cos + result_jen + result_hel + result_jac) / 4
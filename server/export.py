@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+from datetime import datetime
+import sys
+import zlib
+from bson import json_util
+from server.data import connect_to_mongo
+
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_SORT = [("published_date", 1), ("_id", 1)]
+
+
+def export_query(category: str | None = None, start: datetime | None = None, end: datetime | None = None) -> dict:
+    """
+    Filter of the exported articles, `start` is inclusive and `end` exclusive.
+    """
+
+    query = {}
+    if category is not None:
+        query["category"] = category
+    date_range = {}
+    if start is not None:
+        date_range["$gte"] = start
+    if end is not None:
+        date_range["$lt"] = end
+    if date_range:
+        query["published_date"] = date_range
+    return query
+
+
+def encode_batch(documents: list[dict]) -> bytes:
+    """
+    One extended JSON document per line, readable back with `bson.json_util.loads`.
+    """
+
+    return ''.join(json_util.dumps(doc, ensure_ascii=False) + '\n' for doc in documents).encode('utf-8')
+
+
+def gzip_compressor():
+    return zlib.compressobj(wbits=31)
+
+
+def iter_export(collection, query: dict, compress=False):
+    """
+    NDJSON chunks of the matching articles, one chunk per cursor batch, memory stays bounded by the batch size.
+    """
+
+    compressor = gzip_compressor() if compress else None
+    batch = []
+    for doc in collection.find(query, batch_size=EXPORT_BATCH_SIZE).sort(EXPORT_SORT):
+        batch.append(doc)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            chunk = encode_batch(batch)
+            yield compressor.compress(chunk) if compressor else chunk
+            batch = []
+
+    chunk = encode_batch(batch)
+    if compressor:
+        yield compressor.compress(chunk) + compressor.flush()
+    elif chunk:
+        yield chunk
+
+
+async def stream_export(collection, query: dict, compress=False):
+    """
+    Async version of `iter_export` for the API, encoding runs in a thread so long exports do not block other requests.
+    """
+
+    def encode(documents: list[dict], finish: bool) -> bytes:
+        chunk = encode_batch(documents)
+        if compressor is None:
+            return chunk
+        chunk = compressor.compress(chunk)
+        # flush every batch so the client receives data as it is read instead of when zlib's buffer fills
+        return chunk + compressor.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+    compressor = gzip_compressor() if compress else None
+    batch = []
+    async for doc in collection.find(query, batch_size=EXPORT_BATCH_SIZE).sort(EXPORT_SORT):
+        batch.append(doc)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield await asyncio.to_thread(encode, batch, False)
+            batch = []
+
+    chunk = await asyncio.to_thread(encode, batch, True)
+    if chunk:
+        yield chunk
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the newspaper collection as NDJSON.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=27017)
+    parser.add_argument('--category')
+    parser.add_argument('--start', type=parse_date, help='first published date included, ISO format')
+    parser.add_argument('--end', type=parse_date, help='first published date excluded, ISO format')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('-o', '--output', help='output file, standard output if omitted')
+    args = parser.parse_args()
+
+    query = export_query(args.category, args.start, args.end)
+    with connect_to_mongo(args.host, args.port) as client:
+        collection = client['Ganesha_News']['newspaper']
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in iter_export(collection, query, args.gzip):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+
+
+if __name__ == '__main__':
+    main()
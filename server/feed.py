@@ -0,0 +1,121 @@
+from bisect import bisect_left, insort
+import heapq
+from itertools import islice
+from bson import ObjectId
+
+
+def entry_key(entry: tuple):
+    return entry[0], entry[1]
+
+
+class LatestIndex:
+    """
+    Newest articles of each category held in memory, so feed pages do not need a sorted Mongo query.
+
+    Each category keeps up to `capacity` entries of (published_date, _id, index) sorted ascending,
+    the newest article is the last one. The latest feed is a heap merge of the category streams.
+    """
+
+    def __init__(self, categories: list[str], capacity=3000):
+        self.capacity = capacity
+        self.streams: dict[str, list[tuple]] = {category: [] for category in categories}
+        # a complete stream holds every article of its category, running out of it means the feed ended
+        self.complete: dict[str, bool] = {category: True for category in categories}
+        self.num_documents = 0
+        self.last_id: ObjectId | None = None
+
+    async def build(self, collection):
+        fields = {"published_date": 1, "index": 1}
+        sort_criteria = [("published_date", -1), ("_id", -1)]
+        for category in self.streams:
+            documents = await collection.find({"category": category}, fields).sort(sort_criteria).limit(self.capacity).to_list(length=None)
+            self.streams[category] = [(doc['published_date'], doc['_id'], doc['index']) for doc in reversed(documents)]
+            self.complete[category] = len(documents) < self.capacity
+
+        self.num_documents = await collection.count_documents({})
+        last = await collection.find({}, {"_id": 1}).sort("_id", -1).limit(1).to_list(length=None)
+        self.last_id = last[0]['_id'] if last else None
+
+    async def refresh(self, collection) -> bool:
+        """
+        Add the articles inserted since the last build or refresh.
+
+        The updater only appends articles unless it deleted duplicates, which renumbers every `index`,
+        so the index is rebuilt whenever the document count does not add up.
+
+        Returns
+        ----------
+        bool
+            False if a full rebuild was needed.
+        """
+
+        query = {} if self.last_id is None else {"_id": {"$gt": self.last_id}}
+        fields = {"published_date": 1, "index": 1, "category": 1}
+        documents = await collection.find(query, fields).to_list(length=None)
+        num_documents = await collection.count_documents({})
+
+        if self.num_documents + len(documents) != num_documents:
+            # build next to the live streams, then swap them in one go
+            rebuilt = LatestIndex(list(self.streams), self.capacity)
+            await rebuilt.build(collection)
+            self.__dict__.update(rebuilt.__dict__)
+            return False
+
+        self.add(documents)
+        self.num_documents = num_documents
+        return True
+
+    def add(self, documents: list[dict]):
+        for doc in documents:
+            stream = self.streams.get(doc['category'])
+            if stream is not None:
+                insort(stream, (doc['published_date'], doc['_id'], doc['index']), key=entry_key)
+                if len(stream) > self.capacity:
+                    del stream[0]
+                    self.complete[doc['category']] = False
+
+            if self.last_id is None or doc['_id'] > self.last_id:
+                self.last_id = doc['_id']
+
+    def page(self, category: str | None, limit: int, offset=0, after: tuple | None = None) -> list[tuple] | None:
+        """
+        Entries of one feed page, newest first.
+
+        Parameters
+        ----------
+        category : str | None
+            None for the latest feed over every category.
+        after : tuple | None
+            (published_date, _id) of the last article of the previous page.
+
+        Returns
+        ----------
+        list | None
+            None if the page goes past the articles held in memory.
+        """
+
+        categories = list(self.streams) if category is None else [category]
+        streams = []
+        horizon = None
+        for name in categories:
+            stream = self.streams[name]
+            end = len(stream) if after is None else bisect_left(stream, after, key=entry_key)
+            streams.append(self._newest_before(stream, end))
+            if not self.complete[name] and len(stream) > 0:
+                # articles older than the oldest one held might be missing
+                oldest = entry_key(stream[0])
+                horizon = oldest if horizon is None else max(horizon, oldest)
+
+        merged = heapq.merge(*streams, key=entry_key, reverse=True)
+        entries = list(islice(merged, offset, offset + limit))
+
+        if len(entries) < limit and horizon is not None:
+            return None
+        if len(entries) > 0 and horizon is not None and entry_key(entries[-1]) < horizon:
+            return None
+        return entries
+
+    @staticmethod
+    def _newest_before(stream: list[tuple], end: int):
+        for i in range(end - 1, -1, -1):
+            yield stream[i]
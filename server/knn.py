@@ -0,0 +1,68 @@
+import numpy as np
+import numba
+from server.distance import prepared_combined_distance
+
+
+@numba.njit(parallel=True, fastmath=True, cache=True)
+def _exact_neighbors(prepared, num_neighbors, block_size, start, end):
+    num_vectors = prepared.shape[0]
+    indices = np.full((end - start, num_neighbors), -1, dtype=np.int32)
+    distances = np.full((end - start, num_neighbors), np.inf, dtype=np.float32)
+    # each article is its own first neighbour, like in nndescent graphs, even when a duplicate is as close
+    for i in range(start, end):
+        indices[i - start, 0] = i
+        distances[i - start, 0] = 0.0
+
+    num_blocks = (end - start + block_size - 1) // block_size
+    # one thread per block of rows, each block is compared with every block of candidates in turn
+    # so both fit in cache while their distances are computed
+    for row_block in numba.prange(num_blocks):
+        row_start = start + row_block * block_size
+        row_end = min(row_start + block_size, end)
+        for candidate_start in range(0, num_vectors, block_size):
+            candidate_end = min(candidate_start + block_size, num_vectors)
+            for i in range(row_start, row_end):
+                row = i - start
+                for j in range(candidate_start, candidate_end):
+                    if i == j:
+                        continue
+                    distance = prepared_combined_distance(prepared[i], prepared[j])
+                    if distance >= distances[row, num_neighbors - 1]:
+                        continue
+
+                    # insertion into the sorted row, column 0 stays the article itself
+                    position = num_neighbors - 1
+                    while position > 1 and distances[row, position - 1] > distance:
+                        distances[row, position] = distances[row, position - 1]
+                        indices[row, position] = indices[row, position - 1]
+                        position -= 1
+                    distances[row, position] = distance
+                    indices[row, position] = j
+
+    return indices, distances
+
+
+def exact_neighbor_graph(
+    prepared: np.ndarray, num_neighbors=30, block_size=256, start=0, end: int | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact k nearest neighbours of every prepared topic distribution under `prepared_combined_distance`,
+    in the layout of `NNDescent.neighbor_graph`.
+
+    Every pair of articles is compared, the work grows with the square of the number of articles
+    and is spread over all cores (NUMBA_NUM_THREADS).
+
+    Parameters
+    ----------
+    start, end : int
+        Only compute the rows of articles [start, end), against all articles.
+
+    Returns
+    ----------
+    tuple
+        (indices, distances), both (n, num_neighbors) with the article itself in column 0.
+    """
+
+    prepared = np.ascontiguousarray(prepared, dtype=np.float32)
+    end = prepared.shape[0] if end is None else end
+    return _exact_neighbors(prepared, min(num_neighbors, prepared.shape[0]), block_size, start, end)
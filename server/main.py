@@ -1,35 +1,204 @@
 import asyncio
+import numpy as np
+from datetime import datetime
 from typing import Annotated
-from fastapi import FastAPI, Query, HTTPException
-from server.model import Article, Category, ArticleRecommendation, ShortArticle, PyObjectId, SearchResponse
-from server.data import load_neighbor_graph, connect_to_mongo
-from server.updater import update_new_articles
+from fastapi import FastAPI, Query, HTTPException, Request, Response
+from server.model import Category, ArticleRecommendation, ArticleBatchRequest, ShortArticle, PyObjectId, SearchResponse, SearchSort, SuggestResponse, SimilarRequest
+from server.data import load_neighbor_graph, load_search_index, load_processed_titles, connect_to_mongo_async, process_sentence, warm_up_nlp
+from server.pagination import encode_cursor, decode_cursor, after_cursor
+from server.cache import LRUCache, bump_generation, make_etag, etag_matches
+from server import cache as cache_module
+from server.store import ShortArticleStore
+from server.feed import LatestIndex
+from server.search import normalize_query, fold_tokens
+from server.suggest import Suggester
+from server.reloader import Reloader, ReloadError, validate_neighbor_graph
+from server.admission import Bulkhead, AdmissionMiddleware
+from server.export import export_query, stream_export
+from server import similar
+from server import serialize
+from server import metrics
+from server.metrics import phase
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
 import re
 
 
-async def periodic_task():
-    global neighbor_graph
-    await asyncio.sleep(5)
+async def get_data_generation():
+    metadata = await database['metadata'].find_one({"_id": "data_generation"})
+    return metadata['value'] if metadata is not None else None
+
+
+async def watch_data_generation(interval: float):
+    """
+    Reload when the updater worker recorded a new data generation, in case its
+    notification did not reach this server.
+    """
+
     while True:
-        neighbor_graph = await asyncio.to_thread(update_new_articles)
-        await asyncio.sleep(60 * 60 * 12)
+        await asyncio.sleep(interval)
+        try:
+            generation = await get_data_generation()
+        except Exception as e:
+            print(f'Could not read data generation: {type(e).__name__}: {e}')
+            continue
+        if generation != loaded_generation and not reloader.running:
+            reloader.start(reload_data)
+
+
+def start_similar_pool() -> tuple[ProcessPoolExecutor | None, list]:
+    """
+    Worker processes answering /similar with the saved LDA model and NNDescent index.
+
+    Returns
+    ----------
+    tuple
+        The pool, None if the index was never saved, and the futures of its warm up.
+    """
+
+    if not os.path.exists('data/ann_model/nndescent.pkl'):
+        return None, []
+    num_processes = int(os.environ.get("GANESHA_SIMILAR_PROCESSES", 1))
+    # spawn instead of fork, the server process has threads and an event loop that must not be copied
+    pool = ProcessPoolExecutor(num_processes, multiprocessing.get_context('spawn'), initializer=similar.load_models)
+    # load the models now instead of on the first request
+    return pool, [asyncio.wrap_future(pool.submit(similar.warm_up)) for _ in range(num_processes)]
+
+
+async def load_article_store():
+    fields = {"index": 1, "title": 1, "description": 1, "thumbnail": 1}
+    documents = [doc async for doc in database['newspaper'].find({}, fields, batch_size=5000)]
+    return await asyncio.to_thread(ShortArticleStore.build, documents)
+
+
+def update_suggester(rebuild=False):
+    if not os.path.exists('data/preprocess/processed_titles.pkl'):
+        return
+    titles = load_processed_titles()
+    # the updater appends the titles of new articles, only those are added to the live suggester
+    # unless it deleted duplicates
+    suggester.refresh(titles, rebuild)
+
+
+async def reload_data(reloader: Reloader, strict=True):
+    """
+    Load and check a new neighbor graph, search index and article store next to the live ones,
+    then swap all of them at once. Requests keep being served from the old data until the swap.
+
+    Parameters
+    ----------
+    strict : bool
+        Fail when the neighbor graph does not match the `newspaper` collection,
+        otherwise only log it and serve the graph anyway.
+    """
+
+    global neighbor_graph, search_index, article_store, latest_index, loaded_generation, similar_pool
+    # read before loading anything, an update finishing during the reload is picked up by the next one.
+    # a failed reload is not retried until the worker records another generation
+    loaded_generation = await get_data_generation()
+
+    reloader.set_step("loading neighbor graph")
+    new_neighbor_graph = await asyncio.to_thread(load_neighbor_graph)
+
+    reloader.set_step("validating neighbor graph")
+    num_documents = await database['newspaper'].count_documents({})
+    index_range = await (await database['newspaper'].aggregate([
+        {"$group": {"_id": None, "min": {"$min": "$index"}, "max": {"$max": "$index"}}}
+    ])).to_list(length=None)
+    min_index, max_index = (index_range[0]['min'], index_range[0]['max']) if index_range else (0, -1)
+    try:
+        await asyncio.to_thread(validate_neighbor_graph, new_neighbor_graph, num_documents, min_index, max_index)
+    except ReloadError as e:
+        if strict or new_neighbor_graph.ndim != 2:
+            raise
+        # articles whose graph row does not belong to them get cold start recommendations
+        print(f'Serving a neighbor graph that failed validation: {e}')
+
+    reloader.set_step("loading search index")
+    new_search_index = await asyncio.to_thread(load_search_index)
+
+    reloader.set_step("loading article store")
+    new_article_store = await load_article_store()
+
+    reloader.set_step("updating latest index")
+    appended_only = True
+    if latest_index is None:
+        new_latest_index = LatestIndex([category.value for category in Category if category != Category.latest])
+        await new_latest_index.build(database['newspaper'])
+        latest_index = new_latest_index
+    else:
+        # entries added here point at indexes of the new store, until the swap
+        # they are resolved from Mongo because the old store does not match them
+        appended_only = await latest_index.refresh(database['newspaper'])
+
+    reloader.set_step("updating suggestions")
+    # a rebuilt latest index means articles were deleted, and so were their processed titles
+    await asyncio.to_thread(update_suggester, not appended_only)
+
+    reloader.set_step("starting similar article workers")
+    new_similar_pool, warm_ups = start_similar_pool()
+    if similar_pool is not None:
+        # keep answering from the old workers until the new ones loaded the models,
+        # at startup requests wait for the warm up instead of delaying the start
+        try:
+            await asyncio.gather(*warm_ups)
+        except BaseException:
+            new_similar_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    reloader.set_step("swapping")
+    old_similar_pool = similar_pool
+    neighbor_graph, search_index, article_store = new_neighbor_graph, new_search_index, new_article_store
+    similar_pool = new_similar_pool
+    bump_generation(loaded_generation)
+    if old_similar_pool is not None:
+        # queries already sent to the old workers still finish
+        old_similar_pool.shutdown(wait=False)
+    reloader.set_step(None)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global database, neighbor_graph
-    client = connect_to_mongo()
+    global database
+    client = connect_to_mongo_async()
     database = client["Ganesha_News"]
-    neighbor_graph = load_neighbor_graph()
-    # asyncio.create_task(periodic_task())
+    await database['newspaper'].create_index([("category", 1), ("published_date", -1), ("_id", -1)])
+    await database['newspaper'].create_index([("published_date", -1), ("_id", -1)])
+    # there is no older data to keep serving at startup, a graph out of step with Mongo
+    # (an update that crashed half way) is still better than no server
+    await reloader.run(partial(reload_data, strict=False))
+    if search_index is not None:
+        # load the tokenizer in the background instead of on the first search
+        asyncio.create_task(asyncio.to_thread(warm_up_nlp))
+    # updates run in the separate worker process (python -m server.worker), this only picks up their result
+    watcher = asyncio.create_task(watch_data_generation(float(os.environ.get("GANESHA_WATCH_INTERVAL", 60))))
 
     yield
-    client.close()
+    watcher.cancel()
+    if similar_pool is not None:
+        similar_pool.shutdown(wait=False, cancel_futures=True)
+    await client.close()
 
 
+reloader = Reloader()
+latest_index = None
+loaded_generation = None
+similar_pool = None
+suggester = Suggester()
 app = FastAPI(lifespan=lifespan)
+feed_cache = LRUCache(max_size=512, ttl=60 * 10)
+# only ids are cached for searches, weighted by their number so a few deep pages cannot fill the memory
+search_cache = LRUCache(max_size=4096, ttl=60 * 60, max_weight=100000, weigh=lambda value: len(value[0]) + 1)
+cold_start_cache = LRUCache(max_size=4096, ttl=60 * 60 * 24)
+caches = {"feed": feed_cache, "search": search_cache, "cold_start": cold_start_cache}
+FEED_CACHE_CONTROL = "public, max-age=30"
+ARTICLE_CACHE_CONTROL = "public, max-age=300"
 
 origins = [
     "http://localhost:3000",
@@ -37,56 +206,331 @@ origins = [
     "https://stargazer131.github.io",
 ]
 
+# searches get their own threads and concurrency limit, so a burst of them only slows down other searches
+search_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("GANESHA_SEARCH_THREADS", 4)), thread_name_prefix="search"
+)
+# pages fetched for /similar get their own threads, a slow newspaper site never holds a model worker
+url_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("GANESHA_URL_FETCH_THREADS", 4)), thread_name_prefix="url_fetch"
+)
+URL_FETCH_TIMEOUT = float(os.environ.get("GANESHA_URL_FETCH_TIMEOUT", 10))
+# longer than a query, the first ones after a reload may wait for the workers to load the models
+SIMILAR_TIMEOUT = float(os.environ.get("GANESHA_SIMILAR_TIMEOUT", 30))
+bulkheads = {
+    "feed": Bulkhead.from_env("feed", max_concurrency=64, max_queue=256),
+    "article": Bulkhead.from_env("article", max_concurrency=64, max_queue=256),
+    "search": Bulkhead.from_env("search", max_concurrency=8, max_queue=32),
+    "export": Bulkhead.from_env("export", max_concurrency=2, max_queue=4),
+    "similar": Bulkhead.from_env("similar", max_concurrency=4, max_queue=16),
+}
+
+# inside CORS so shed responses still carry the CORS headers
+app.add_middleware(
+    AdmissionMiddleware,
+    routes=[
+        ("/articles/batch", bulkheads["article"]),
+        ("/articles", bulkheads["feed"]),
+        ("/article/", bulkheads["article"]),
+        ("/search", bulkheads["search"]),
+        ("/export", bulkheads["export"]),
+        ("/similar", bulkheads["similar"]),
+    ],
+    retry_after=int(os.environ.get("GANESHA_RETRY_AFTER", 1)),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.registry.register(metrics.Gauge(
+    'cache_requests', 'Cache lookups by cache and result.',
+    lambda: {
+        (name, result): cache.stats()[key]
+        for name, cache in caches.items() for result, key in (('hit', 'hits'), ('miss', 'misses'))
+    },
+    ('cache', 'result'),
+))
+metrics.registry.register(metrics.Gauge(
+    'cache_entries', 'Number of cached entries.',
+    lambda: {(name,): cache.stats()["size"] for name, cache in caches.items()},
+    ('cache',),
+))
+metrics.registry.register(metrics.Gauge(
+    'bulkhead_active_requests', 'Requests running inside each bulkhead.',
+    lambda: {(name,): bulkhead.active for name, bulkhead in bulkheads.items()},
+    ('bulkhead',),
+))
+metrics.registry.register(metrics.Gauge(
+    'bulkhead_queued_requests', 'Requests waiting for a slot in each bulkhead.',
+    lambda: {(name,): bulkhead.waiting for name, bulkhead in bulkheads.items()},
+    ('bulkhead',),
+))
+metrics.registry.register(metrics.Gauge(
+    'bulkhead_max_concurrency', 'Concurrency limit of each bulkhead.',
+    lambda: {(name,): bulkhead.max_concurrency for name, bulkhead in bulkheads.items()},
+    ('bulkhead',),
+))
+metrics.registry.register(metrics.Gauge(
+    'data_generation', 'Number of data reloads since the process started.', lambda: cache_module.data_generation
+))
+metrics.registry.register(metrics.Gauge(
+    'model_reload_failed', '1 if the last model reload failed.', lambda: reloader.state == "failed"
+))
 
+# handlers return JSON encoded straight from trusted Mongo documents, response_model only documents the schema
 @app.get("/articles", response_model=list[ShortArticle])
-def get_articles_by_category(
-    page: Annotated[int, Query(ge=1, le=20)] = 1,
+async def get_articles_by_category(
+    request: Request,
+    page: Annotated[int, Query(ge=1)] = 1,
     limit: Annotated[int, Query(ge=10, le=40)] = 20,
-    category: Category = Category.latest
+    category: Category = Category.latest,
+    cursor: str | None = None,
 ):
-    query = {}
+    """
+    Pass the `X-Next-Cursor` header of the previous response as `cursor` to get the next page,
+    `page` is ignored in that case.
+    """
+
+    cache_key = (category, page if cursor is None else cursor, limit)
+    etag = make_etag('articles', *cache_key)
+    headers = {"ETag": etag, "Cache-Control": FEED_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    cached = feed_cache.get(cache_key)
+    if cached is not None:
+        body, next_cursor = cached
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = next_cursor
+        return serialize.json_response(body, headers)
+
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+    feed_category = None if category == Category.latest else category.value
+    with phase("latest_index"):
+        entries = latest_index.page(feed_category, limit, offset=(page - 1) * limit if after is None else 0, after=after)
+
+    if entries is not None:
+        articles = await get_feed_articles(entries)
+        last_key = entries[-1][:2] if len(entries) > 0 else None
+    else:
+        # deeper than the in-memory index goes
+        articles = await find_feed_articles(feed_category, limit, page, after)
+        last_key = (articles[-1]['published_date'], articles[-1]['_id']) if len(articles) > 0 else None
+
+    next_cursor = None
+    if len(articles) == limit:
+        next_cursor = encode_cursor(*last_key)
+        headers["X-Next-Cursor"] = next_cursor
+
+    with phase("serialization"):
+        body = serialize.dumps([serialize.short_article(article) for article in articles])
+    feed_cache.set(cache_key, (body, next_cursor))
+    return serialize.json_response(body, headers)
+
+
+async def get_feed_articles(entries: list[tuple]):
+    """
+    Short articles of latest index entries, read from the article store when it is in sync with them.
+    """
+
+    store = article_store
+    articles = [store.get(index) for _, _, index in entries]
+    if all(article is not None and article['_id'] == id for article, (_, id, _) in zip(articles, entries)):
+        return articles
+
+    ids = [id for _, id, _ in entries]
     fields = {"title": 1, "description": 1, "thumbnail": 1}
-    sort_criteria = {"published_date": -1}
-    if category != Category.latest:
+    with phase("mongo"):
+        found_articles = await database['newspaper'].find({"_id": {"$in": ids}}, fields).to_list(length=None)
+    found_articles = {article['_id']: article for article in found_articles}
+    return [found_articles[id] for id in ids if id in found_articles]
+
+
+async def find_feed_articles(category: str | None, limit: int, page: int, after: tuple | None):
+    query = {}
+    fields = {"title": 1, "description": 1, "thumbnail": 1, "published_date": 1}
+    sort_criteria = [("published_date", -1), ("_id", -1)]
+    if category is not None:
         query = {"category": category}
-    
-    articles = database['newspaper'].find(query, fields).sort(sort_criteria).skip((page - 1) * limit).limit(limit)
-    return [ShortArticle(**article) for article in articles]
+
+    if after is None:
+        articles = database['newspaper'].find(query, fields).sort(sort_criteria).skip((page - 1) * limit).limit(limit)
+    else:
+        query.update(after_cursor(*after))
+        articles = database['newspaper'].find(query, fields).sort(sort_criteria).limit(limit)
+
+    with phase("mongo"):
+        return await articles.to_list(length=None)
+
+
+def graph_row(graph: np.ndarray, store: ShortArticleStore, article: dict) -> int | None:
+    """
+    Row of the article in the neighbor graph, None for articles inserted after the graph was built.
+
+    Deleting duplicates renumbers the articles in Mongo before the new graph is loaded, so the row is
+    the `index` the article had when the graph and store were loaded, not its current `index`.
+    """
+
+    row = store.find(article['_id'])
+    return row if row is not None and row < graph.shape[0] else None
+
+
+async def cold_start_recommendations(article: dict, limit: int) -> list[int] | None:
+    """
+    `index` of the articles closest to an article missing from the neighbor graph,
+    from the topic vector inferred by a /similar worker. Cached until the next reload.
+
+    Returns
+    ----------
+    list | None
+        None if the similar article workers are not available or too slow right now.
+    """
+
+    cache_key = (article['_id'], limit)
+    cached = cold_start_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    pool = similar_pool
+    if pool is None:
+        return None
+    fields = {key: article[key] for key in ("title", "description", "content")}
+    with phase("cold_start"):
+        try:
+            # one more in case the article itself is in the nndescent index
+            indexes = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(pool, similar.similar_to_article, fields, limit + 1),
+                SIMILAR_TIMEOUT,
+            )
+        except (BrokenProcessPool, asyncio.TimeoutError):
+            # not cached, the next request for this article tries again
+            return None
+
+    indexes = [index for index in indexes if index != article['index']][:limit]
+    cold_start_cache.set(cache_key, indexes)
+    return indexes
 
 
 @app.get("/article/{article_id}", response_model=ArticleRecommendation)
-def get_article_and_recommendations_by_id(
+async def get_article_and_recommendations_by_id(
+    request: Request,
     article_id: PyObjectId, 
     limit: Annotated[int, Query(ge=5, le=20)] = 10,
-):    
-    article = database['newspaper'].find_one({"_id": article_id})
+):
+    # articles never change after ingest, only their recommendations change with the data generation
+    etag = make_etag('article', str(article_id), limit)
+    headers = {"ETag": etag, "Cache-Control": ARTICLE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    with phase("mongo"):
+        article = await database['newspaper'].find_one({"_id": article_id})
     if article is None:
         raise HTTPException(404, "Article not found")
     
-    res_index = neighbor_graph[article['index']]
-    filter_index = res_index.astype(int).tolist()[1 : limit + 1]
-    query = {"index": {"$in": filter_index}}
-    fields = {"title": 1, "description": 1, "thumbnail": 1}
+    # a reload only rebinds the globals, this request keeps using the graph and store it started with
+    graph, store = neighbor_graph, article_store
+    row = graph_row(graph, store, article)
+    if row is not None:
+        with phase("neighbors"):
+            filter_index = graph[row].astype(int).tolist()[1 : limit + 1]
+    else:
+        filter_index = await cold_start_recommendations(article, limit)
+        if filter_index is None:
+            # the ETag does not depend on the body, an empty list must not be revalidated until the next generation
+            filter_index = []
+            headers = {"Cache-Control": "no-store"}
+    recommendation_list = store.get_many(filter_index)
 
-    recommendation_list = database['newspaper'].find(query, fields)
-    article = Article(**article)
-    recommendations = [ShortArticle(**item) for item in recommendation_list]
-    return ArticleRecommendation(article=article, recommendations=recommendations)
+    with phase("serialization"):
+        body = serialize.dumps({
+            "article": serialize.article(article),
+            "recommendations": [serialize.short_article(item) for item in recommendation_list],
+        })
+    return serialize.json_response(body, headers)
 
 
-@app.get("/search", response_model=SearchResponse)
-def get_articles_by_keyword(
-    keyword: str,
-    limit: Annotated[int, Query(ge=1, le=50)] = 30,
-    page: Annotated[int, Query(ge=1, le=50)] = 1,
-):
+@app.post("/articles/batch", response_model=list[ArticleRecommendation])
+async def get_articles_by_ids(batch: ArticleBatchRequest):
+    """
+    Articles in the same order as `ids`, unknown ids are skipped.
+    `recommendations` is empty unless requested.
+    """
+
+    with phase("mongo"):
+        found_articles = await database['newspaper'].find({"_id": {"$in": batch.ids}}).to_list(length=None)
+    found_articles = {article['_id']: article for article in found_articles}
+    articles = [found_articles[id] for id in dict.fromkeys(batch.ids) if id in found_articles]
+
+    recommendation_lists = [[] for _ in articles]
+    if batch.recommendations and len(articles) > 0:
+        graph, store = neighbor_graph, article_store
+        graph_rows = [graph_row(graph, store, article) for article in articles]
+        with phase("neighbors"):
+            rows = graph[[row for row in graph_rows if row is not None]]
+            rows = iter(rows[:, 1 : batch.limit + 1].astype(int).tolist())
+        cold_rows = iter(await asyncio.gather(*[
+            cold_start_recommendations(article, batch.limit) for article, row in zip(articles, graph_rows) if row is None
+        ]))
+        rows = [next(rows) if row is not None else next(cold_rows) or [] for row in graph_rows]
+
+        with phase("neighbors"):
+            # every neighbour is looked up once even if several articles share it
+            neighbours = {index: store.get(index) for index in set(index for row in rows for index in row)}
+            recommendation_lists = [
+                [neighbours[index] for index in row if neighbours[index] is not None]
+                for row in rows
+            ]
+
+    with phase("serialization"):
+        body = serialize.dumps([
+            {
+                "article": serialize.article(article),
+                "recommendations": [serialize.short_article(item) for item in recommendations],
+            }
+            for article, recommendations in zip(articles, recommendation_lists)
+        ])
+    return serialize.json_response(body)
+
+
+async def search_by_index(keyword: str, limit: int, page: int, sort: SearchSort):
+    index = search_index
+
+    def find_page():
+        tokens = process_sentence(keyword)
+        # tokenizing depends on case ("Bộ Y tế" is one fixed word, "bộ y tế" is not),
+        # so the cache key is what the index actually searches for
+        cache_key = (tuple(sorted(fold_tokens(tokens))), sort, page, limit)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        positions = index.search(tokens)
+        if sort == SearchSort.relevance:
+            ranked_positions = index.rank(tokens, positions, page * limit)
+        else:
+            ranked_positions = positions
+        result = index.get_ids(ranked_positions[(page - 1) * limit : page * limit]), min(len(positions), limit * 50)
+        search_cache.set(cache_key, result)
+        return result
+
+    with phase("search_index"):
+        return await asyncio.get_running_loop().run_in_executor(search_executor, find_page)
+
+
+async def search_by_regex(keyword: str, limit: int, page: int):
     regex_pattern = re.compile(
         fr"(?:\s+[“'\"]?{keyword}[”'\"]?$|^[“'\"]?{keyword}[”'\"]?\s+|\s+[“'\"]?{keyword}[”'\"]?\s+)", re.IGNORECASE
     )
@@ -97,20 +541,157 @@ def get_articles_by_keyword(
             {"description": {"$regex": regex_pattern}}
         ]
     }
-    fields = {"title": 1, "description": 1, "thumbnail": 1}
     sort_criteria = {"published_date": -1}
+    pipeline = [
+        {"$match": query},
+        {"$project": {"published_date": 1}},
+        {"$facet": {
+            "articles": [
+                {"$sort": sort_criteria},
+                {"$skip": (page - 1) * limit},
+                {"$limit": limit},
+            ],
+            "total": [
+                {"$limit": limit * 50},
+                {"$count": "count"},
+            ],
+        }},
+    ]
+
+    with phase("mongo"):
+        cursor = await database['newspaper'].aggregate(pipeline)
+        result = await cursor.next()
+    total = result['total'][0]['count'] if len(result['total']) > 0 else 0
+    return [article['_id'] for article in result['articles']], total
+
+
+@app.get("/search", response_model=SearchResponse)
+async def get_articles_by_keyword(
+    keyword: str,
+    limit: Annotated[int, Query(ge=1, le=50)] = 30,
+    page: Annotated[int, Query(ge=1, le=50)] = 1,
+    sort: SearchSort = SearchSort.published_date,
+):
+    if search_index is not None:
+        page_ids, total = await search_by_index(keyword, limit, page, sort)
+    else:
+        # fall back to a case insensitive collection scan until the search index has been built,
+        # relevance ranking needs the index so the fallback always sorts by date
+        query = normalize_query(keyword)
+        cache_key = (query, page, limit)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            page_ids, total = cached
+        else:
+            page_ids, total = await search_by_regex(query, limit, page)
+            total = min(total, limit * 50)
+            search_cache.set(cache_key, (page_ids, total))
+
+    fields = {"title": 1, "description": 1, "thumbnail": 1}
+    with phase("mongo"):
+        found_articles = await database['newspaper'].find({"_id": {"$in": page_ids}}, fields).to_list(length=None)
+    found_articles = {article['_id']: article for article in found_articles}
+
+    with phase("serialization"):
+        articles = [serialize.short_article(found_articles[id]) for id in page_ids if id in found_articles]
+        body = serialize.dumps({"articles": articles, "total": total})
+    return serialize.json_response(body)
+
+
+@app.post("/similar", response_model=list[ShortArticle])
+async def get_similar_articles(request: SimilarRequest):
+    """
+    Articles closest in topic to a text, or to the article at `url` on one of the crawled newspapers.
+    """
+
+    pool, store = similar_pool, article_store
+    if pool is None:
+        raise HTTPException(503, "Similar article index is not available")
+
+    loop = asyncio.get_running_loop()
+    if request.url is not None:
+        with phase("url_fetch"):
+            try:
+                article = await asyncio.wait_for(
+                    loop.run_in_executor(url_executor, similar.crawl_url, request.url, URL_FETCH_TIMEOUT),
+                    URL_FETCH_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(504, "Timed out fetching url")
+        if article is None:
+            raise HTTPException(422, "Could not extract an article from url")
+
+    with phase("similar"):
+        try:
+            if request.text is not None:
+                future = loop.run_in_executor(pool, similar.similar_to_text, request.text, request.limit)
+            else:
+                future = loop.run_in_executor(pool, similar.similar_to_article, article, request.limit)
+            indexes = await asyncio.wait_for(future, SIMILAR_TIMEOUT)
+        except BrokenProcessPool:
+            # the models failed to load or a worker died, the next reload starts new workers
+            raise HTTPException(503, "Similar article index is not available")
+        except asyncio.TimeoutError:
+            raise HTTPException(503, "Similar article index is busy")
+
+    with phase("serialization"):
+        body = serialize.dumps([serialize.short_article(item) for item in store.get_many(indexes)])
+    return serialize.json_response(body)
+
+
+@app.get("/suggest", response_model=SuggestResponse)
+async def get_suggestions(
+    prefix: Annotated[str, Query(max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=20)] = 10,
+):
+    """
+    Most frequent title terms starting with `prefix`, meant to be called on every keystroke of the search box.
+    """
+
+    with phase("suggest"):
+        suggestions = suggester.suggest(prefix, limit)
+    return serialize.json_response(serialize.dumps({"suggestions": suggestions}))
+
+
+@app.get("/export", include_in_schema=False)
+async def export_articles(
+    category: Category | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    gzip: bool = False,
+):
+    """
+    Stream the matching articles as NDJSON in MongoDB extended JSON, oldest first.
+    `start` is inclusive and `end` exclusive.
+    """
+
+    query = export_query(None if category in (None, Category.latest) else category.value, start, end)
+    headers = {"Content-Disposition": 'attachment; filename="newspaper.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        stream_export(database['newspaper'], query, gzip), media_type="application/x-ndjson", headers=headers
+    )
+
+
+@app.get("/reload-model", include_in_schema=False, status_code=202)
+async def reload_model():
+    if not reloader.start(reload_data):
+        return {"message": "Model reload already running", "status": reloader.status()}
+    return {"message": "Model reload started", "status": reloader.status()}
+
+
+@app.get("/reload-model/status", include_in_schema=False)
+async def get_reload_status():
+    return reloader.status()
 
-    combined_articles = list(database['newspaper'].find(query, fields).sort(sort_criteria))
-    start_index = min(len(combined_articles) - 1, (page - 1) * limit)
-    end_index = min(len(combined_articles), page * limit)
 
-    articles = [ShortArticle(**article) for article in combined_articles[start_index : end_index]]
-    return SearchResponse(articles=articles, total=min(len(combined_articles), limit * 50))
+@app.get("/cache-stats", include_in_schema=False)
+def get_cache_stats():
+    return {name: cache.stats() for name, cache in caches.items()}
 
 
-@app.get("/reload-model", include_in_schema=False)
-def reload_model():    
-    global neighbor_graph
-    neighbor_graph = load_neighbor_graph()
-    return {"message": "Model reloaded successfully"}
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
@@ -0,0 +1,181 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# seconds spent in each phase of the request being handled
+request_phases: ContextVar[dict | None] = ContextVar('request_phases', default=None)
+
+
+def format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    labels = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1.0):
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label_values, value in self.values.items():
+            lines.append(f'{self.name}{format_labels(self.label_names, label_values)} {value}')
+        return lines
+
+
+class Gauge:
+    """
+    Gauge read from a callback at scrape time.
+
+    The callback returns a number, or a dict of label values -> number for labelled gauges.
+    """
+
+    def __init__(self, name: str, documentation: str, callback: callable, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.label_names = tuple(label_names)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            lines.append(f'{self.name}{format_labels(self.label_names, label_values)} {float(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value: float, *label_values):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+                break
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_values, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = format_labels(self.label_names, label_values, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.label_names, label_values, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {series["count"]}')
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f'{self.name}_sum{labels} {series["sum"]}')
+            lines.append(f'{self.name}_count{labels} {series["count"]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+request_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ('method', 'route')
+))
+request_count = registry.register(Counter(
+    'http_requests_total', 'Requests by route and status code.', ('method', 'route', 'status')
+))
+phase_latency = registry.register(Histogram(
+    'http_request_phase_seconds', 'Time spent in each phase (mongo, serialization, neighbors, ...) by route.',
+    ('route', 'phase')
+))
+
+requests_shed = registry.register(Counter(
+    'http_requests_shed_total', 'Requests rejected with 503 because their bulkhead was saturated.', ('bulkhead',)
+))
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Add the time spent in the block to the `name` phase of the current request.
+    """
+
+    start_time = perf_counter()
+    try:
+        yield
+    finally:
+        phases = request_phases.get()
+        if phases is not None:
+            phases[name] = phases.get(name, 0.0) + perf_counter() - start_time
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status code and phase breakdown of every http request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        phases = {}
+        token = request_phases.set(phases)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start_time = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - start_time
+            request_phases.reset(token)
+            # the router stores the matched route in the scope, use its template to keep label cardinality low
+            route = scope.get("route")
+            route = route.path if route is not None else "<unmatched>"
+            request_latency.observe(elapsed, scope["method"], route)
+            request_count.inc(scope["method"], route, str(status_code))
+            for name, seconds in phases.items():
+                phase_latency.observe(seconds, route, name)
@@ -1,5 +1,5 @@
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from bson import ObjectId
 from datetime import datetime
 
@@ -18,6 +18,11 @@ class Category(str, Enum):
     latest = "moi-nhat"
 
 
+class SearchSort(str, Enum):
+    published_date = "published_date"
+    relevance = "relevance"
+
+
 class PyObjectId(ObjectId):
     @classmethod
     def __get_validators__(cls):
@@ -69,3 +74,25 @@ class ArticleRecommendation(BaseModel):
 class SearchResponse(BaseModel):
     articles: list[ShortArticle]
     total: int
+
+
+class SuggestResponse(BaseModel):
+    suggestions: list[str]
+
+
+class ArticleBatchRequest(BaseModel):
+    ids: list[PyObjectId] = Field(min_length=1, max_length=50)
+    recommendations: bool = False
+    limit: int = Field(default=10, ge=5, le=20)
+
+
+class SimilarRequest(BaseModel):
+    text: str | None = Field(default=None, min_length=1, max_length=100000)
+    url: str | None = Field(default=None, max_length=2000)
+    limit: int = Field(default=10, ge=5, le=20)
+
+    @model_validator(mode='after')
+    def check_source(self):
+        if (self.text is None) == (self.url is None):
+            raise ValueError('Exactly one of text and url is required')
+        return self
@@ -0,0 +1,50 @@
+import base64
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(published_date: datetime, article_id: ObjectId) -> str:
+    """
+    Encode the sort key of the last article in a page into an opaque cursor.
+
+    Mongo stores datetimes as naive UTC with millisecond precision, so the timestamp is kept in milliseconds.
+    """
+
+    millis = (published_date.replace(tzinfo=None) - EPOCH) // timedelta(milliseconds=1)
+    raw = f'{millis}:{article_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    """
+    Raises
+    ----------
+    ValueError
+        If the cursor is malformed.
+    """
+
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        millis, article_id = raw.split(':')
+        published_date = EPOCH + timedelta(milliseconds=int(millis))
+        return published_date, ObjectId(article_id)
+    except (ValueError, OverflowError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def after_cursor(published_date: datetime, article_id: ObjectId) -> dict:
+    """
+    Range predicate that resumes a (published_date desc, _id desc) scan right after a decoded cursor.
+    """
+
+    return {
+        "$or": [
+            {"published_date": {"$lt": published_date}},
+            {"published_date": published_date, "_id": {"$lt": article_id}},
+        ]
+    }
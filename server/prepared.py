@@ -0,0 +1,48 @@
+"""
+Per vector terms of the prepared distance, numpy only so the API process can prepare
+query vectors without importing numba with `server.distance`.
+"""
+
+import numpy as np
+
+
+FLOAT32_EPS = np.finfo(np.float32).eps
+
+# a prepared row is [x, pdf of x, sqrt(x), squared l2 norm, l1 norm, sum of pdf * log(pdf)]
+NUM_SCALARS = 3
+
+
+def prepared_dimension(num_topics: int) -> int:
+    return 3 * num_topics + NUM_SCALARS
+
+
+def is_prepared(vectors: np.ndarray, num_topics: int) -> bool:
+    return vectors.shape[-1] == prepared_dimension(num_topics)
+
+
+def prepare_vectors(vectors: np.ndarray) -> np.ndarray:
+    """
+    Everything `combined_distance` computes per vector, computed once per topic distribution
+    so `prepared_combined_distance` only has the pairwise terms left.
+
+    Parameters
+    ----------
+    vectors : np.ndarray
+        (n, num_topics) topic distributions, or a single one.
+    """
+
+    single = np.ndim(vectors) == 1
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32)).astype(np.float64)
+    dim = vectors.shape[1]
+
+    l1_norms = vectors.sum(axis=1, keepdims=True)
+    pdfs = (vectors + FLOAT32_EPS) / (l1_norms + FLOAT32_EPS * dim)
+    prepared = np.hstack([
+        vectors,
+        pdfs,
+        np.sqrt(vectors),
+        np.square(vectors).sum(axis=1, keepdims=True),
+        l1_norms,
+        (pdfs * np.log(pdfs)).sum(axis=1, keepdims=True),
+    ]).astype(np.float32)
+    return prepared[0] if single else prepared
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timezone
+import numpy as np
+
+
+class ReloadError(Exception):
+    pass
+
+
+def validate_neighbor_graph(graph: np.ndarray, num_documents: int, min_index: int, max_index: int):
+    """
+    Check that the graph has one row per article and only points at existing articles.
+
+    Reading the min / max of every row also pulls the whole memory mapped file into the page cache,
+    so the first requests after the swap do not pay for disk reads.
+
+    Raises
+    ----------
+    ReloadError
+        If the graph does not match the `newspaper` collection.
+    """
+
+    if graph.ndim != 2 or not np.issubdtype(graph.dtype, np.integer):
+        raise ReloadError(f'Neighbor graph must be a 2D integer array, got {graph.ndim}D {graph.dtype}')
+
+    if graph.shape[0] != num_documents:
+        raise ReloadError(f'Neighbor graph has {graph.shape[0]} rows but newspaper has {num_documents} documents')
+
+    if num_documents > 0 and (min_index != 0 or max_index != num_documents - 1):
+        raise ReloadError(f'Article index range [{min_index}, {max_index}] does not match {num_documents} documents')
+
+    if graph.size > 0:
+        # nndescent pads missing neighbours with -1
+        if graph.min() < -1 or graph.max() >= num_documents:
+            raise ReloadError('Neighbor graph points at articles that do not exist')
+
+        # each article is its own nearest neighbour
+        sample = np.linspace(0, graph.shape[0] - 1, num=min(graph.shape[0], 1000), dtype=np.int64)
+        if np.mean(graph[sample, 0] == sample) < 0.9:
+            raise ReloadError('Neighbor graph rows are not aligned with article index')
+
+
+class Reloader:
+    """
+    Run one reload at a time in the background and keep track of its progress.
+    """
+
+    def __init__(self):
+        self.state = "idle"
+        self.step = None
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.task = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self, reload: callable) -> bool:
+        """
+        Schedule `reload(reloader)` as a background task.
+
+        Returns
+        ----------
+        bool
+            False if a reload is already running.
+        """
+
+        if self.running:
+            return False
+        self.state = "pending"
+        self.step = None
+        self.error = None
+        self.task = asyncio.create_task(self.run(reload))
+        # the error is already kept in the status
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return True
+
+    async def run(self, reload: callable):
+        self.state = "running"
+        self.step = None
+        self.error = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        try:
+            await reload(self)
+            self.state = "succeeded"
+        except Exception as e:
+            self.state = "failed"
+            self.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            self.finished_at = datetime.now(timezone.utc)
+
+    def set_step(self, step: str):
+        self.step = step
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "step": self.step,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
@@ -0,0 +1,175 @@
+from datetime import datetime
+import unicodedata
+from bson import ObjectId
+import numpy as np
+
+
+EPOCH = datetime(1970, 1, 1)
+EMPTY_POSTING = np.empty(0, dtype=np.int32)
+
+# BM25F parameters, a title token counts as much as TITLE_WEIGHT description tokens
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2.0
+
+
+def normalize_query(text: str) -> str:
+    """
+    Lowercase, NFC and whitespace collapsed form of a user query, so the same search typed
+    with another case, unicode composition or spacing maps to one cache entry.
+    """
+
+    return ' '.join(unicodedata.normalize('NFC', text).lower().split())
+
+
+def fold_tokens(tokens: list[str]) -> set[str]:
+    """
+    Case folded tokens, postings and queries both go through it so matching ignores case like the regex search does.
+    """
+
+    return {token.lower() for token in tokens}
+
+
+class InvertedIndex:
+    """
+    Token -> posting list index over article title and description.
+
+    Every article gets an internal position in insertion order, posting lists hold those positions
+    sorted by published date (newest first). All posting lists share the same global order,
+    so intersecting them keeps the result sorted by date without any extra sort.
+    """
+
+    def __init__(self):
+        self.ids: list[ObjectId] = []
+        self.positions: dict[ObjectId, int] = {}
+        self.dates = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.lengths = np.empty(0, dtype=np.float32)
+        self.total_length = 0.0
+        self.postings: dict[str, np.ndarray] = {}
+        self.term_freqs: dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, documents: list[tuple[ObjectId, datetime, list[str], list[str]]]):
+        """
+        Parameters
+        ----------
+        documents : list
+            List of (_id, published_date, title tokens, description tokens).
+        """
+
+        start = len(self.ids)
+        new_dates = []
+        new_lengths = []
+        new_postings = {}
+        for offset, (article_id, published_date, title_tokens, description_tokens) in enumerate(documents):
+            position = start + offset
+            self.ids.append(article_id)
+            self.positions[article_id] = position
+            new_dates.append((published_date - EPOCH).total_seconds())
+            new_lengths.append(TITLE_WEIGHT * len(title_tokens) + len(description_tokens))
+
+            term_freqs = {}
+            for token in title_tokens:
+                token = token.lower()
+                term_freqs[token] = term_freqs.get(token, 0.0) + TITLE_WEIGHT
+            for token in description_tokens:
+                token = token.lower()
+                term_freqs[token] = term_freqs.get(token, 0.0) + 1.0
+            for token, term_freq in term_freqs.items():
+                new_postings.setdefault(token, []).append((position, term_freq))
+
+        self.dates = np.concatenate((self.dates, np.array(new_dates, dtype=np.int64)))
+        self.alive = np.concatenate((self.alive, np.ones(len(new_dates), dtype=bool)))
+        self.lengths = np.concatenate((self.lengths, np.array(new_lengths, dtype=np.float32)))
+        self.total_length += sum(new_lengths)
+
+        for token, entries in new_postings.items():
+            positions, term_freqs = zip(*entries)
+            merged = np.concatenate((self.postings.get(token, EMPTY_POSTING), np.array(positions, dtype=np.int32)))
+            merged_freqs = np.concatenate(
+                (self.term_freqs.get(token, np.empty(0, dtype=np.float32)), np.array(term_freqs, dtype=np.float32))
+            )
+            order = self._date_order(merged)
+            self.postings[token] = merged[order]
+            self.term_freqs[token] = merged_freqs[order]
+
+    def remove(self, article_ids: list[ObjectId]):
+        """
+        Tombstone articles, their positions are filtered out of every search result.
+        """
+
+        for article_id in article_ids:
+            position = self.positions.pop(article_id, None)
+            if position is not None:
+                self.alive[position] = False
+                self.total_length -= float(self.lengths[position])
+
+    def search(self, tokens: list[str]) -> np.ndarray:
+        """
+        Positions of the alive articles containing all tokens, newest first.
+        """
+
+        if len(tokens) == 0:
+            return EMPTY_POSTING
+
+        postings = []
+        for token in fold_tokens(tokens):
+            posting = self.postings.get(token)
+            if posting is None:
+                return EMPTY_POSTING
+            postings.append(posting)
+
+        postings.sort(key=len)
+        result = postings[0]
+        for posting in postings[1:]:
+            result = result[np.isin(result, posting, assume_unique=True)]
+            if len(result) == 0:
+                break
+
+        return result[self.alive[result]]
+
+    def rank(self, tokens: list[str], candidates: np.ndarray, top_k: int) -> np.ndarray:
+        """
+        Select the `top_k` candidates with the highest BM25 score, best first.
+
+        Parameters
+        ----------
+        candidates : np.ndarray
+            Result of `search` for the same tokens.
+        """
+
+        if len(candidates) == 0 or top_k <= 0:
+            return EMPTY_POSTING
+
+        num_documents = len(self.positions)
+        avg_length = self.total_length / max(num_documents, 1)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[candidates] / avg_length)
+
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for token in fold_tokens(tokens):
+            posting = self.postings[token]
+            # candidates is a subsequence of every posting list in the same order,
+            # so masking the posting list lines its frequencies up with the candidates
+            term_freqs = self.term_freqs[token][np.isin(posting, candidates, assume_unique=True)]
+            doc_freq = len(posting)
+            idf = np.log(1 + (num_documents - doc_freq + 0.5) / (doc_freq + 0.5))
+            scores += idf * term_freqs * (BM25_K1 + 1) / (term_freqs + length_norm)
+
+        if top_k < len(candidates):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(candidates))
+
+        # best score first, newer article first on ties
+        top = top[np.lexsort((top, -scores[top]))]
+        return candidates[top]
+
+    def get_ids(self, positions: np.ndarray) -> list[ObjectId]:
+        return [self.ids[position] for position in positions]
+
+    def _date_order(self, positions: np.ndarray) -> np.ndarray:
+        # newest first, the latest inserted article wins on ties
+        return np.lexsort((-positions, -self.dates[positions]))
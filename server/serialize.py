@@ -0,0 +1,50 @@
+from bson import ObjectId
+from fastapi import Response
+import orjson
+
+
+def encode_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+def dumps(content) -> bytes:
+    """
+    Encode trusted Mongo documents straight to JSON, datetimes are written in ISO format like pydantic does.
+    """
+
+    return orjson.dumps(content, default=encode_default)
+
+
+def short_article(doc: dict) -> dict:
+    """
+    Same keys and order as `ShortArticle` serialized by alias.
+    """
+
+    return {
+        "_id": doc['_id'],
+        "thumbnail": doc['thumbnail'],
+        "title": doc['title'],
+        "description": doc['description'],
+    }
+
+
+def article(doc: dict) -> dict:
+    """
+    Same keys and order as `Article` serialized by alias.
+    """
+
+    return {
+        "_id": doc['_id'],
+        "thumbnail": doc['thumbnail'],
+        "category": doc['category'],
+        "published_date": doc['published_date'],
+        "title": doc['title'],
+        "description": doc['description'],
+        "content": doc['content'],
+    }
+
+
+def json_response(body: bytes, headers: dict = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
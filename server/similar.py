@@ -0,0 +1,118 @@
+"""
+Topic model inference and NNDescent queries, run in worker processes of a ProcessPoolExecutor
+so the API process never imports gensim / pynndescent and its event loop is never blocked by them.
+"""
+
+from urllib.parse import urlparse
+import numpy as np
+from server import data
+from server.prepared import prepare_vectors, is_prepared
+
+
+# loaded once per worker process by `load_models`
+lda_model = None
+dictionary = None
+nndescent = None
+
+
+def load_models():
+    """
+    Initializer of the worker processes.
+    """
+
+    global lda_model, dictionary, nndescent
+    from gensim.models import LdaModel
+    from gensim.corpora import Dictionary
+
+    lda_model = LdaModel.load('data/lda_model/lda_model')
+    dictionary = Dictionary.load('data/lda_model/dictionary')
+    nndescent = data.load_nndescent()
+
+
+def warm_up() -> int:
+    """
+    Build the search graph of the index and compile the query code, which the first query would do otherwise.
+
+    Returns
+    ----------
+    int
+        Number of indexed articles.
+    """
+
+    nndescent.prepare()
+    similar_to_text('Việt Nam', 1)
+    return nndescent._raw_data.shape[0]
+
+
+def topic_vector(tokens: list[str]) -> np.ndarray:
+    from gensim.matutils import sparse2full
+
+    bow = dictionary.doc2bow(tokens)
+    return sparse2full(lda_model[bow], lda_model.num_topics).astype(np.float32)
+
+
+def similar_to_tokens(tokens: list[str], limit: int) -> list[int]:
+    """
+    Returns
+    ----------
+    list
+        `index` of the `limit` nearest articles, nearest first.
+    """
+
+    vector = topic_vector(tokens)
+    # indexes saved before the prepared distance was introduced hold raw topic distributions
+    if is_prepared(nndescent._raw_data, lda_model.num_topics):
+        vector = prepare_vectors(vector)
+    indices, _ = nndescent.query(vector[None, :], k=limit)
+    return [int(index) for index in indices[0] if index >= 0]
+
+
+def similar_to_text(text: str, limit: int) -> list[int]:
+    return similar_to_tokens(data.process_paragraph(text), limit)
+
+
+def similar_to_article(article: dict, limit: int) -> list[int]:
+    # same tokens as update_nndescent_index uses for the articles in the graph
+    tokens = (
+        data.process_sentence(article['title'])
+        + data.process_paragraph(article['description'])
+        + data.process_content(article['content'])
+    )
+    return similar_to_tokens(tokens, limit)
+
+
+def crawler_for(url: str):
+    """
+    Crawler of the newspaper hosting `url`, None if it is not one of the crawled newspapers.
+    """
+
+    from crawler.vnexpress import VnexpressCrawler
+    from crawler.dantri import DantriCrawler
+    from crawler.vietnamnet import VietnamnetCrawler
+    from crawler.vtcnews import VtcnewsCrawler
+
+    host = urlparse(url).hostname or ''
+    for crawler in (VnexpressCrawler, DantriCrawler, VietnamnetCrawler, VtcnewsCrawler):
+        root_host = urlparse(crawler.root_url).hostname
+        if host == root_host or host.endswith('.' + root_host):
+            return crawler
+    return None
+
+
+def crawl_url(url: str, timeout: float) -> dict | None:
+    """
+    Title, description and content of the article at `url`, for `similar_to_article`.
+
+    Network bound, so it runs in a thread pool of the API process instead of tying up a model worker.
+
+    Returns
+    ----------
+    dict | None
+        None if the page could not be crawled within `timeout` seconds per request.
+    """
+
+    crawler = crawler_for(url)
+    article = crawler.crawl_article_content(url, timeout=timeout) if crawler is not None else None
+    if article is None:
+        return None
+    return {key: article[key] for key in ("title", "description", "content")}
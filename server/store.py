@@ -0,0 +1,98 @@
+from bson import ObjectId
+import numpy as np
+
+
+class ShortArticleStore:
+    """
+    Read only `ShortArticle` fields of every article, addressed by the article `index`
+    (the same row number used by the neighbor graph).
+
+    Each text field is kept as one utf-8 buffer plus an offsets array instead of millions of
+    python strings, so the whole corpus fits in a few compact arrays.
+    """
+
+    fields = ('title', 'description', 'thumbnail')
+
+    def __init__(self, ids: np.ndarray, present: np.ndarray, buffers: dict[str, bytes], offsets: dict[str, np.ndarray]):
+        self.ids = ids
+        self.present = present
+        self.buffers = buffers
+        self.offsets = offsets
+        # _id -> index lookup, binary search over the sorted ids instead of a dict of ObjectId
+        rows = np.flatnonzero(present)
+        keys = ids[rows].view('S12').ravel()
+        order = np.argsort(keys, kind='stable')
+        self.sorted_ids = keys[order]
+        self.sorted_rows = rows[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, documents: list[dict]):
+        """
+        Parameters
+        ----------
+        documents : list
+            Documents with `index`, `_id` and the short article fields.
+        """
+
+        size = max((doc['index'] for doc in documents), default=-1) + 1
+        ids = np.zeros((size, 12), dtype=np.uint8)
+        present = np.zeros(size, dtype=bool)
+        encoded = {field: [b''] * size for field in cls.fields}
+
+        for doc in documents:
+            index = doc['index']
+            ids[index] = np.frombuffer(doc['_id'].binary, dtype=np.uint8)
+            present[index] = True
+            for field in cls.fields:
+                encoded[field][index] = doc[field].encode('utf-8')
+
+        buffers = {}
+        offsets = {}
+        for field in cls.fields:
+            lengths = np.fromiter((len(value) for value in encoded[field]), dtype=np.int64, count=size)
+            offsets[field] = np.concatenate(([0], np.cumsum(lengths)))
+            buffers[field] = b''.join(encoded[field])
+
+        return cls(ids, present, buffers, offsets)
+
+    def get(self, index: int) -> dict | None:
+        """
+        Returns
+        ----------
+        dict | None
+            Short article document, None if no article has this index.
+        """
+
+        if index < 0 or index >= len(self.ids) or not self.present[index]:
+            return None
+
+        doc = {"_id": ObjectId(self.ids[index].tobytes())}
+        for field in self.fields:
+            start, end = self.offsets[field][index], self.offsets[field][index + 1]
+            doc[field] = self.buffers[field][start : end].decode('utf-8')
+        return doc
+
+    def find(self, article_id: ObjectId) -> int | None:
+        """
+        Returns
+        ----------
+        int | None
+            `index` the article had when the store was built, None if it is not in the store.
+        """
+
+        key = np.array(article_id.binary, dtype='S12')
+        position = np.searchsorted(self.sorted_ids, key)
+        if position < len(self.sorted_ids) and self.sorted_ids[position] == key:
+            return int(self.sorted_rows[position])
+        return None
+
+    def get_many(self, indexes: list[int]) -> list[dict]:
+        """
+        Short article documents in the same order as `indexes`, unknown indexes are skipped.
+        """
+
+        docs = (self.get(index) for index in indexes)
+        return [doc for doc in docs if doc is not None]
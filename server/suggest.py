@@ -0,0 +1,97 @@
+from bisect import bisect_left
+import unicodedata
+import numpy as np
+from server.search import normalize_query
+
+
+class Suggester:
+    """
+    Frequency ranked autocomplete over the tokens of the processed titles.
+
+    Terms are kept as one sorted array of lowercase keys, the terms starting with a prefix are
+    a contiguous range found with two binary searches, and only that range is partially sorted.
+    """
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        # most frequent original spelling of each key, fixed words like Việt_Nam keep their case
+        self.forms: dict[str, dict[str, int]] = {}
+        self.num_titles = 0
+        # (sorted keys, display terms, frequencies), replaced as a whole so lookups never see a mix
+        self.table: tuple[list[str], list[str], np.ndarray] = ([], [], np.empty(0, dtype=np.int64))
+
+    def add_titles(self, titles: list[str]):
+        """
+        Parameters
+        ----------
+        titles : list
+            Output of `process_title`, tokens separated by spaces and words inside a token by `_`.
+        """
+
+        for title in titles:
+            for token in title.split():
+                term = token.replace('_', ' ')
+                key = normalize_query(term)
+                self.counts[key] = self.counts.get(key, 0) + 1
+                forms = self.forms.setdefault(key, {})
+                forms[term] = forms.get(term, 0) + 1
+
+        self.num_titles += len(titles)
+        keys = sorted(self.counts)
+        terms = [max(self.forms[key].items(), key=lambda item: item[1])[0] for key in keys]
+        frequencies = np.array([self.counts[key] for key in keys], dtype=np.int64)
+        self.table = (keys, terms, frequencies)
+
+    def refresh(self, titles: list[str], rebuild=False):
+        """
+        Add the titles appended since the last call.
+
+        The updater appends new processed titles, except when it deletes duplicates: the kept titles
+        are then followed by the new ones, so the count of titles seen so far no longer marks where
+        the new ones start and everything is rebuilt.
+
+        Parameters
+        ----------
+        rebuild : bool
+            Titles were deleted since the last call.
+        """
+
+        if rebuild or len(titles) < self.num_titles:
+            self.counts, self.forms, self.num_titles = {}, {}, 0
+        self.add_titles(titles[self.num_titles :])
+
+    def suggest(self, prefix: str, limit=10) -> list[str]:
+        """
+        Complete the last term of `prefix`, the terms before it are kept as typed.
+
+        The longest tail of the prefix matching a key wins, so "việt n" completes to the fixed word
+        "Việt Nam" and "giá v" completes "v" after "giá".
+        """
+
+        words = unicodedata.normalize('NFC', prefix).split()
+        keys = normalize_query(prefix).split(' ')
+        for start in range(len(keys)):
+            terms = self._complete(' '.join(keys[start:]), limit)
+            if len(terms) > 0:
+                head = ' '.join(words[:start])
+                return [f'{head} {term}' if head else term for term in terms]
+        return []
+
+    def _complete(self, prefix: str, limit: int) -> list[str]:
+        if len(prefix) == 0:
+            return []
+
+        keys, terms, frequencies = self.table
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\U0010ffff', lo=start)
+        if start == end:
+            return []
+
+        frequencies = frequencies[start:end]
+        if end - start > limit:
+            top = np.argpartition(-frequencies, limit - 1)[:limit]
+        else:
+            top = np.arange(end - start)
+        # most frequent first, alphabetical on ties
+        top = top[np.lexsort((top, -frequencies[top]))]
+        return [terms[start + i] for i in top]
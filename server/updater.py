@@ -7,6 +7,11 @@ from crawler.database.vtcnews import VtcnewsCrawler
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from server import data
+from server.search import InvertedIndex
+from server.prepared import prepare_vectors, is_prepared
+from server.distance import prepared_combined_distance
+from server.knn import exact_neighbor_graph
+import os
 import random
 from gensim.models import LdaModel
 from gensim.corpora import Dictionary
@@ -19,6 +24,11 @@ from pynndescent import NNDescent
 FLOAT32_EPS = np.finfo(np.float32).eps
 FLOAT32_MAX = np.finfo(np.float32).max
 
+# how update_nndescent_index computes the neighbor graph, "nndescent" (approximate) or "exact" (brute force)
+GRAPH_BUILDER = os.environ.get('GANESHA_GRAPH_BUILDER', 'nndescent')
+
+# indexes are now built with server.distance.prepared_combined_distance,
+# this stays importable because nndescent.pkl files saved before reference it
 @numba.njit(fastmath=True)
 def combined_distance(x, y):
     # prepare
@@ -270,6 +280,12 @@ def check_duplicated_titles(similarity_threshold=0.75, time_threshold_in_days=1.
             result = b_collection.insert_many(black_list)
             print(f'Added {len(result.inserted_ids)} black list document')
             
+    # Remove deleted articles from search index
+    search_index = data.load_search_index()
+    if search_index is not None and len(old_dup_index) > 0:
+        search_index.remove([old_articles[id]['_id'] for id in old_dup_index])
+        data.save_search_index(search_index)
+
     # Update processed titles list
     updated_old_titles = [title for i, title in enumerate(old_titles) if i not in old_dup_index]
     updated_new_titles = [title for i, title in enumerate(new_titles) if i not in new_dup_index]
@@ -281,7 +297,28 @@ def check_duplicated_titles(similarity_threshold=0.75, time_threshold_in_days=1.
     data.save_topic_distributions(topic_distributions)
 
 
-def update_nndescent_index():
+def load_nndescent_for_update(num_documents: int, num_topics: int) -> NNDescent | None:
+    """
+    Saved index if new articles can be appended to it, None if it has to be rebuilt:
+    missing, built on raw topic distributions by an older version,
+    or not built from the same `num_documents` rows because duplicates were deleted.
+    """
+
+    try:
+        nndescent = data.load_nndescent()
+    except FileNotFoundError:
+        return None
+
+    if nndescent._raw_data.shape[0] != num_documents or not is_prepared(nndescent._raw_data, num_topics):
+        return None
+    return nndescent
+
+
+def update_nndescent_index(full_rebuild=False):
+    # checked before anything is saved, so a typo does not leave topic distributions without a graph
+    if GRAPH_BUILDER not in ('nndescent', 'exact'):
+        raise ValueError(f'Unknown GANESHA_GRAPH_BUILDER {GRAPH_BUILDER!r}, expected "nndescent" or "exact"')
+
     print('Load LDA model')
     lda_model = LdaModel.load('data/lda_model/lda_model')
     dictionary = Dictionary.load('data/lda_model/dictionary')
@@ -299,12 +336,33 @@ def update_nndescent_index():
     corpus = [dictionary.doc2bow(doc) for doc in processed_documents]
     lda_corpus = lda_model[corpus]
     new_topic_distributions = np.array([sparse2full(vec, lda_model.num_topics) for vec in lda_corpus])
-    topic_distributions = np.vstack((data.load_topic_distributions(), new_topic_distributions))
+    old_topic_distributions = data.load_topic_distributions()
+    topic_distributions = np.vstack((old_topic_distributions, new_topic_distributions))
     data.save_topic_distributions(topic_distributions)
 
-    print('Updating nndescent index')
-    nndescent = NNDescent(topic_distributions, metric=combined_distance)
-    data.save_neighbor_graph(nndescent.neighbor_graph[0])
+    if GRAPH_BUILDER == 'exact':
+        print('Computing exact neighbor graph')
+        prepared = prepare_vectors(topic_distributions)
+        neighbor_graph, distances = exact_neighbor_graph(prepared)
+        # seeded with the exact graph nndescent has nothing left to improve,
+        # it is still saved for the queries of the API
+        nndescent = NNDescent(
+            prepared, metric=prepared_combined_distance, init_graph=neighbor_graph, init_dist=distances, tree_init=False
+        )
+    else:
+        nndescent = None if full_rebuild else load_nndescent_for_update(len(old_topic_distributions), lda_model.num_topics)
+        if nndescent is None:
+            print('Rebuilding nndescent index')
+            nndescent = NNDescent(prepare_vectors(topic_distributions), metric=prepared_combined_distance)
+        else:
+            # the existing graph seeds the search, so only the new points and their neighbourhoods move much
+            print(f'Adding {len(new_topic_distributions)} articles to nndescent index')
+            nndescent.update(xs_fresh=prepare_vectors(new_topic_distributions))
+        neighbor_graph = nndescent.neighbor_graph[0]
+
+    data.save_neighbor_graph(neighbor_graph)
+    # the API queries the index itself for texts and articles that are not in the graph
+    data.save_nndescent(nndescent)
 
 
 def update_database():
@@ -323,19 +381,59 @@ def update_database():
         print(f'Copy {len(result.inserted_ids)} articles to original database')
         temp_collection.drop()
 
+    update_search_index(articles)
+
+
+def build_search_index():
+    """
+    Index every article of `newspaper` from scratch and save it, replacing the saved search index.
+    """
+
+    print('Building search index')
+    search_index = InvertedIndex()
+    with data.connect_to_mongo() as client:
+        db = client['Ganesha_News']
+        projection = {"title": 1, "description": 1, "published_date": 1}
+        articles = list(db['newspaper'].find({}, projection))
+
+    update_search_index(articles, search_index)
+
+
+def update_search_index(articles: list[dict], search_index: InvertedIndex = None):
+    """
+    Add inserted articles (with `_id`) to the saved search index.
+    """
+
+    if search_index is None:
+        search_index = data.load_search_index()
+        if search_index is None:
+            # the articles are already in `newspaper`, so they are part of the full build
+            build_search_index()
+            return
+
+    print('Updating search index')
+    search_index.add([
+        (article['_id'], article['published_date'], *data.process_search_tokens(article['title'], article['description']))
+        for article in articles
+    ])
+    data.save_search_index(search_index)
+
 
-def update_new_articles(vnexpress=True, dantri=True, vietnamnet=True, vtcnews=True, limit=10 ** 9):
+def update_new_articles(vnexpress=True, dantri=True, vietnamnet=True, vtcnews=True, limit=10 ** 9, full_rebuild=False):
     print('\nStep 1: Crawl new articles')
     crawl_new_articles(vnexpress, dantri, vietnamnet, vtcnews, limit)
 
     if data.is_collection_empty_or_not_exist('temporary_newspaper'):
         print('No new articles have been found')
+        if not os.path.exists('data/search/inverted_index.pkl'):
+            # servers search with a collection scan until the first index is built
+            build_search_index()
     else:
         print('\nStep 2: Check for duplicated titles')
         check_duplicated_titles()
 
         print('\nStep 3: Update ANN model')
-        update_nndescent_index()
+        update_nndescent_index(full_rebuild)
         
         print('\nStep 4: Update database')
         update_database()
@@ -0,0 +1,183 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+import os
+import socket
+import threading
+import time
+import uuid
+import requests
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from server import data
+from server.updater import update_new_articles, build_search_index
+
+
+UPDATE_LOCK = 'update_new_articles'
+
+
+class MongoLock:
+    """
+    Lease based lock stored in the `locks` collection, shared by every worker using the same database.
+
+    The lease is renewed in the background while the lock is held, if the worker dies
+    the lease expires after `ttl` seconds and another worker can take over.
+    """
+
+    def __init__(self, database, name: str, ttl=600.0):
+        self.collection = database['locks']
+        self.name = name
+        self.ttl = ttl
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._stop_renewing = threading.Event()
+        self._renewer = None
+
+    def acquire(self) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl), "acquired_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # the lock document exists and is held by someone else, so the upsert tried to insert it again
+            return False
+
+        self._stop_renewing.clear()
+        self._renewer = threading.Thread(target=self._renew, daemon=True)
+        self._renewer.start()
+        return True
+
+    def _renew(self):
+        while not self._stop_renewing.wait(self.ttl / 3):
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+            self.collection.update_one({"_id": self.name, "owner": self.owner}, {"$set": {"expires_at": expires_at}})
+
+    def release(self):
+        self._stop_renewing.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def bump_data_generation(database) -> int:
+    """
+    Record in the `metadata` collection that the articles, graph and search index changed,
+    API servers poll it and reload when it moves.
+    """
+
+    metadata = database['metadata'].find_one_and_update(
+        {"_id": "data_generation"},
+        {"$inc": {"value": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return metadata['value']
+
+
+def notify_servers(urls: list[str], timeout=10.0):
+    """
+    Ask every API server to reload now instead of at its next metadata poll.
+    """
+
+    for url in urls:
+        try:
+            response = requests.get(f'{url.rstrip("/")}/reload-model', timeout=timeout)
+            response.raise_for_status()
+            print(f'Notified {url}: {response.json()["message"]}')
+        except requests.RequestException as e:
+            print(f'Could not notify {url}: {e}')
+
+
+def run_update(urls: list[str], lock_ttl=600.0, job: callable = update_new_articles, **crawl_options) -> bool:
+    """
+    Run one update unless another worker is already running one.
+
+    Parameters
+    ----------
+    job : callable
+        Update to run under the lock, `build_search_index` rebuilds the search index without crawling.
+
+    Returns
+    ----------
+    bool
+        False if the lock was held by another worker.
+    """
+
+    with data.connect_to_mongo() as client:
+        database = client['Ganesha_News']
+        lock = MongoLock(database, UPDATE_LOCK, lock_ttl)
+        if not lock.acquire():
+            print('Another update is running, skipping')
+            return False
+
+        with lock:
+            start_time = time.time()
+            job(**crawl_options)
+            generation = bump_data_generation(database)
+            print(f'Update finished in {time.time() - start_time:.0f}s, data generation {generation}')
+
+    notify_servers(urls)
+    return True
+
+
+def run_forever(urls: list[str], interval_hours=12.0, lock_ttl=600.0, full_rebuild_every=14, **crawl_options):
+    """
+    Parameters
+    ----------
+    full_rebuild_every : int
+        Rebuild the nndescent index from scratch every this many runs instead of adding the new articles to it,
+        0 to never force it (it is still rebuilt when duplicates were deleted).
+    """
+
+    next_run = time.monotonic()
+    num_runs = 0
+    while True:
+        time.sleep(max(0.0, next_run - time.monotonic()))
+        next_run = time.monotonic() + interval_hours * 3600
+        num_runs += 1
+        full_rebuild = full_rebuild_every > 0 and num_runs % full_rebuild_every == 0
+        try:
+            run_update(urls, lock_ttl, full_rebuild=full_rebuild, **crawl_options)
+        except Exception as e:
+            # keep the schedule going, the next run starts from whatever this one left in temporary_newspaper
+            print(f'Update failed: {type(e).__name__}: {e}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl new articles and rebuild the recommendation data outside the API.')
+    parser.add_argument('--once', action='store_true', help='run one update and exit')
+    parser.add_argument('--interval', type=float, default=12.0, help='hours between updates')
+    parser.add_argument('--lock-ttl', type=float, default=600.0, help='seconds before the lock of a dead worker expires')
+    parser.add_argument(
+        '--notify', nargs='*', default=os.environ.get('GANESHA_API_URLS', 'http://localhost:8000').split(','),
+        help='API servers to reload after an update, GANESHA_API_URLS by default',
+    )
+    parser.add_argument('--limit', type=int, default=10 ** 9, help='maximum number of articles crawled per category')
+    parser.add_argument('--full-rebuild', action='store_true', help='rebuild the nndescent index from scratch (with --once)')
+    parser.add_argument(
+        '--full-rebuild-every', type=int, default=14, help='runs between full rebuilds of the nndescent index, 0 for never'
+    )
+    parser.add_argument(
+        '--build-search-index', action='store_true', help='rebuild the search index from every article and exit'
+    )
+    args = parser.parse_args()
+
+    urls = [url for url in args.notify if url]
+    if args.build_search_index:
+        run_update(urls, args.lock_ttl, build_search_index)
+    elif args.once:
+        run_update(urls, args.lock_ttl, limit=args.limit, full_rebuild=args.full_rebuild)
+    else:
+        run_forever(urls, args.interval, args.lock_ttl, args.full_rebuild_every, limit=args.limit)
+
+
+if __name__ == '__main__':
+    main()